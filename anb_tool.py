@@ -1,16 +1,51 @@
 from pathlib import Path
 import sys
-sys.path.insert(0, 'include')
+import argparse
+sys.path.insert(0, str(Path(__file__).resolve().parent.joinpath('include')))
 
 from anb_pack import ANBPack
-from anb_unpack import ANBUnpack    
+from anb_unpack import ANBUnpack, parse_frame_ranges, parse_workers
+from wflz_cache import WFLZCache, DEFAULT_MAX_SIZE
+from frame_format import FRAME_FORMATS
+from profiler import Profiler, add_profile_arguments, finish_profile
+from tool_log import logger, setup_logging, add_logging_arguments
     
 if __name__ == '__main__':
-    if len(sys.argv) != 2: 
-        print("Error: Please specify a target .anb file or directory to pack.")
-        exit()
-    filename = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Unpack an .anb file, or pack an unpacked .anb folder.")
+    parser.add_argument('target', help="an .anb file to unpack or a directory to pack")
+    parser.add_argument('--atlas', action='store_true', help="unpack unique frames into a few sprite-sheet PNGs instead of one PNG per frame")
+    parser.add_argument('--frame-format', choices=FRAME_FORMATS, default='png', help="png, uncompressed tga, or raw RGBA npy frames (packing reads any of them)")
+    parser.add_argument('--compress-level', type=int, choices=range(10), metavar='0-9', help="PNG zlib level, 0 stores frames uncompressed")
+    parser.add_argument('--sequence', type=int, action='append', dest='sequences', metavar='HASH', help="only unpack this sequence (hash_name), can be given more than once")
+    parser.add_argument('--frames', type=parse_frame_ranges, metavar='RANGES', help="only unpack these frame indices, e.g. 0-10,15")
+    parser.add_argument('--workers', type=parse_workers, metavar='SPEC', help="decode frames in a pipeline, N threads per stage or e.g. decompress=2,encode=4,write=2")
+    parser.add_argument('--queue-size', type=int, metavar='N', help="frames waiting between two pipeline stages")
+    parser.add_argument('--cache-dir', help="where compressed frames are cached between packs (default: your user cache folder)")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_SIZE >> 20, metavar='MB', help="maximum size of the frame cache")
+    parser.add_argument('--no-cache', action='store_true', help="always compress every frame")
+    add_profile_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args.verbose, args.quiet)
+
+    selective = args.sequences is not None or args.frames is not None
+    if selective and (args.atlas or not Path(args.target).is_file()):
+        parser.error("--sequence and --frames only work when unpacking one-PNG-per-frame")
+
+    if args.atlas and args.frame_format != 'png':
+        parser.error("--atlas always writes PNG sprite sheets")
+    if args.compress_level is not None and args.frame_format != 'png':
+        parser.error("--compress-level only applies to --frame-format png")
+
+    profiler = Profiler(enabled=bool(args.profile))
+    filename = args.target
     if Path(filename).is_file():
-        ANBUnpack(filename)
+        ANBUnpack(filename, args.atlas, profiler, args.sequences and set(args.sequences), args.frames, args.workers, args.queue_size,
+                  frame_format=args.frame_format, compress_level=args.compress_level)
     else:
-        ANBPack(filename)
\ No newline at end of file
+        try:
+            ANBPack(filename, None if args.no_cache else WFLZCache(args.cache_dir, args.cache_size << 20), profiler)
+        except ValueError as error:
+            logger.error(str(error))
+            sys.exit(1)
+    finish_profile(profiler, args)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+from pathlib import Path
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.joinpath('include')))
+from pak_tool import PAKTool
+from tool_log import logger, setup_logging, add_logging_arguments
+from frame_format import FRAME_FORMATS
+import logging
+
+
+def unpack_pak(filename, output_dir):
+    PAKTool(filename, output_dir=output_dir)
+    parent_dir = Path(output_dir or filename.parent).joinpath(filename.stem)
+    return sorted(parent_dir.rglob('*.anb'))
+
+
+def unpack_anb(filename, atlas=False, frame_options=None):
+    from anb_unpack import ANBUnpack
+    ANBUnpack(filename, atlas, **(frame_options or {}))
+    return filename
+
+
+# The .pak a direct-mode worker has open, kept mapped between its entries.
+_archive = None
+
+
+def unpack_pak_anb(pak_file, name, directory, atlas=False, frame_options=None):
+    # Decodes one .anb straight out of the mapped .pak, never writing the
+    # .anb itself to disk.
+    global _archive
+    from anb_unpack import ANBUnpack
+    from pak_archive import PakArchive
+    if _archive is None or _archive.filename != pak_file:
+        if _archive is not None:
+            _archive.close()
+        _archive = PakArchive(pak_file)
+    ANBUnpack(_archive[name].data, atlas, directory=directory, **(frame_options or {}))
+    return name
+
+
+def list_anbs(pak_file, output_dir):
+    from pak_archive import PakArchive
+    parent_dir = Path(output_dir or pak_file.parent).joinpath(pak_file.stem)
+    with PakArchive(pak_file) as archive:
+        return [(name, parent_dir.joinpath(name).with_suffix('')) for name in archive.names() if name.endswith('.anb')]
+
+
+class BatchTool:
+    def __init__(self, game_dir, output_dir=None, jobs=None, pak_jobs=2, queue_size=None, atlas=False, direct=False, frame_options=None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.queue_size = queue_size or self.jobs * 4
+        self.errors = []
+
+        pak_files = [Path(game_dir)] if Path(game_dir).is_file() else sorted(Path(game_dir).rglob('*.pak'))
+        logger.info(f"Found {len(pak_files)} .pak file(s) in {game_dir}")
+
+        if direct:
+            anb_count = self.unpack_direct(pak_files, output_dir, atlas, frame_options)
+            self.finish(f"Decoded {anb_count} .anb file(s) from {len(pak_files)} .pak")
+            return
+
+        anb_count = 0
+        # Workers log at the same level as this process, even when spawned.
+        log_levels = (logger.isEnabledFor(logging.DEBUG), not logger.isEnabledFor(logging.INFO))
+        with ProcessPoolExecutor(pak_jobs, initializer=setup_logging, initargs=log_levels) as pak_pool, \
+                ProcessPoolExecutor(self.jobs, initializer=setup_logging, initargs=log_levels) as anb_pool:
+            pak_futures = {pak_pool.submit(unpack_pak, pak_file, output_dir): pak_file for pak_file in pak_files}
+            pending = set()
+
+            for pak_future in as_completed(pak_futures):
+                try:
+                    anb_files = pak_future.result()
+                except Exception as error:
+                    self.errors.append((pak_futures[pak_future], error))
+                    continue
+
+                for anb_file in anb_files:
+                    # Bounded hand-off: wait for the ANB stage to drain before queueing more.
+                    while len(pending) >= self.queue_size:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        anb_count += self.collect(done)
+                    future = anb_pool.submit(unpack_anb, anb_file, atlas, frame_options)
+                    future.filename = anb_file
+                    pending.add(future)
+
+            done, _ = wait(pending)
+            anb_count += self.collect(done)
+
+        self.finish(f"Unpacked {len(pak_files)} .pak and {anb_count} .anb file(s)")
+
+    def unpack_direct(self, pak_files, output_dir, atlas, frame_options):
+        # Entries are grouped by .pak, so each worker maps an archive once and
+        # decodes its .anb entries in place. Only the frames and metadata
+        # reach the disk.
+        anb_count = 0
+        log_levels = (logger.isEnabledFor(logging.DEBUG), not logger.isEnabledFor(logging.INFO))
+        with ProcessPoolExecutor(self.jobs, initializer=setup_logging, initargs=log_levels) as anb_pool:
+            pending = set()
+            for pak_file in pak_files:
+                try:
+                    anbs = list_anbs(pak_file, output_dir)
+                except Exception as error:
+                    self.errors.append((pak_file, error))
+                    continue
+
+                for name, directory in anbs:
+                    while len(pending) >= self.queue_size:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        anb_count += self.collect(done)
+                    future = anb_pool.submit(unpack_pak_anb, pak_file, name, directory, atlas, frame_options)
+                    future.filename = f"{pak_file}:{name}"
+                    pending.add(future)
+
+            done, _ = wait(pending)
+            anb_count += self.collect(done)
+        return anb_count
+
+    def finish(self, summary):
+        for filename, error in self.errors:
+            logger.error(f"{filename}: {error}")
+        logger.info(f"{summary}, {len(self.errors)} error(s).")
+
+    def collect(self, futures):
+        finished = 0
+        for future in futures:
+            try:
+                future.result()
+                finished += 1
+            except Exception as error:
+                self.errors.append((future.filename, error))
+        return finished
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Unpack every .pak in a game directory and every .anb inside them.")
+    parser.add_argument('game_dir', help="game directory, or a single .pak")
+    parser.add_argument('--output', help="directory to unpack into, defaults to next to each .pak")
+    parser.add_argument('--jobs', type=int, metavar='N', help="processes decoding .anb files, defaults to the CPU count")
+    parser.add_argument('--pak-jobs', type=int, default=2, metavar='N', help="processes unpacking .pak files")
+    parser.add_argument('--queue-size', type=int, metavar='N', help="maximum .anb files waiting to be decoded")
+    parser.add_argument('--atlas', action='store_true', help="unpack each .anb into sprite-sheet PNGs instead of one PNG per frame")
+    parser.add_argument('--frame-format', choices=FRAME_FORMATS, default='png', help="png, uncompressed tga, or raw RGBA npy frames")
+    parser.add_argument('--compress-level', type=int, choices=range(10), metavar='0-9', help="PNG zlib level, 0 stores frames uncompressed")
+    parser.add_argument('--direct', action='store_true', help="decode .anb entries straight from each .pak, writing only their frames, not the .pak contents")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args.verbose, args.quiet)
+
+    if args.atlas and args.frame_format != 'png':
+        parser.error("--atlas always writes PNG sprite sheets")
+    if args.compress_level is not None and args.frame_format != 'png':
+        parser.error("--compress-level only applies to --frame-format png")
+
+    frame_options = {"frame_format": args.frame_format, "compress_level": args.compress_level}
+    BatchTool(args.game_dir, args.output, args.jobs, args.pak_jobs, args.queue_size, args.atlas, args.direct, frame_options)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Node decoding throughput of ANBToJSON and ANBFile on a synthetic .anb with
+# tens of thousands of nodes.
+#
+#   python benchmarks/bench_anb_parse.py [--frames N] [--sequences N] [--repeat N]
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.joinpath('include')))
+
+from anbjson import ANBToJSON
+from anbfile import ANBFile
+from synthetic import build_anb, write_anb
+
+
+def count_nodes(node):
+    return 1 + sum(count_nodes(child) for child in node['children'])
+
+
+def walk_anbfile(filename):
+    with ANBFile(filename) as anb:
+        stack = [anb.root]
+        while stack:
+            node = stack.pop()
+            node.body
+            if node.type == 2:
+                node.pieces()
+            stack.extend(node.children)
+
+
+def bench(label, parse, filename, node_count, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parse(filename)
+    seconds = time.perf_counter() - start
+    print(f"{label:<10} {node_count * repeat / seconds:12.0f} nodes/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=4000)
+    parser.add_argument('--sequences', type=int, default=500)
+    parser.add_argument('--frames-per-sequence', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filename = Path(temp_dir).joinpath('synthetic.anb')
+        metadata = build_anb(args.frames, args.sequences, args.frames_per_sequence, 8, 8, pieces_per_side=4)
+        write_anb(filename, metadata)
+        node_count = count_nodes(metadata['Node'])
+        print(f"Log: {node_count} nodes, {filename.stat().st_size} bytes")
+
+        bench('ANBToJSON', ANBToJSON, filename, node_count, args.repeat)
+        bench('ANBFile', walk_anbfile, filename, node_count, args.repeat)
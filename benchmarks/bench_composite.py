@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Frame compositing time as the number of vertex pieces grows: the old
+# per-piece Pillow crop/paste against NumPy slice assignment.
+#
+#   python benchmarks/bench_composite.py [--size 512] [--repeat N]
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.joinpath('include')))
+
+from PIL import Image
+from anb_unpack import ANBUnpack, np
+from synthetic import make_pieces
+
+
+def composite_crop_paste(_buffer, frame_width, frame_height, vertices):
+    image_out = Image.frombytes('RGBA', (frame_width, frame_height), _buffer, 'raw')
+    final_image = Image.new("RGBA", (frame_width, frame_height))
+    for vertex in vertices:
+        region = (vertex["texX"], vertex["texY"], vertex["texX"] + vertex["width"], vertex["texY"] + vertex["height"])
+        piece = image_out.crop(region)
+        final_image.paste(piece, region[:2], piece)
+    return final_image
+
+
+def bench(composite, _buffer, size, pieces, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        composite(_buffer, size, size, pieces)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if np is None:
+        sys.exit("Error: NumPy is not installed, nothing to compare against.")
+
+    rnd = random.Random(0)
+    _buffer = bytes(rnd.getrandbits(8) for _ in range(args.size * args.size * 4))
+    unpacker = ANBUnpack.__new__(ANBUnpack)
+
+    print(f"{'pieces':>8} {'crop/paste':>12} {'numpy':>12}")
+    for pieces_per_side in (2, 8, 16, 32):
+        pieces = make_pieces(args.size, args.size, pieces_per_side)
+        old = bench(composite_crop_paste, _buffer, args.size, pieces, args.repeat)
+        new = bench(unpacker.composite_image, _buffer, args.size, pieces, args.repeat)
+        print(f"{len(pieces):>8} {old * 1000:>10.2f}ms {new * 1000:>10.2f}ms")
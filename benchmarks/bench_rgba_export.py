@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Measures how fast compress_image can hand an RGBA frame to the wfLZ
+# encoder: the old per-pixel struct.pack loop against Image.tobytes().
+#
+#   python benchmarks/bench_rgba_export.py [IMAGE.png] [--size 256] [--repeat N]
+
+import argparse
+import struct
+import time
+
+from PIL import Image
+
+
+def export_per_pixel(image):
+    width, height = image.size
+    pixels = list(image.getdata())
+    pixels = [pixels[i * width:(i + 1) * width] for i in range(height)]
+
+    image_data = bytearray()
+    for row in pixels:
+        for r,g,b,a in row:
+            image_data += struct.pack('<BBBB', r, g, b, a)
+    return bytes(image_data)
+
+
+def export_tobytes(image):
+    return image.tobytes()
+
+
+def bench(export, image, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        export(image)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename', nargs='?')
+    parser.add_argument('--size', type=int, default=256)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.filename:
+        image = Image.open(args.filename).convert('RGBA')
+    else:
+        image = Image.radial_gradient('L').resize((args.size, args.size)).convert('RGBA')
+
+    assert export_per_pixel(image) == export_tobytes(image)
+
+    pixel_count = image.width * image.height * args.repeat
+    for label, export in (('per-pixel', export_per_pixel), ('tobytes', export_tobytes)):
+        seconds = bench(export, image, args.repeat)
+        print(f"{label:<10} {pixel_count / seconds:14.0f} pixels/s")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# End-to-end benchmark on a synthetic .pak full of synthetic .anb files:
+# unpack the .pak, parse/unpack every .anb, pack them again and repack the
+# .pak. Each stage runs in a fresh process so its peak RSS is its own.
+#
+#   python benchmarks/bench_suite.py [--anbs N] [--frames N] [--size N]
+#       [--baseline FILE] [--update-baseline] [--threshold 0.25] [--output FILE]
+#
+# With --baseline, exits with status 1 when any stage got slower than the
+# baseline by more than the threshold.
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.joinpath('include')))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic import write_pak
+
+# Stages this much slower or less are timer noise, never regressions.
+MIN_REGRESSION_SECONDS = 0.05
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def stage_pak_unpack(work_dir):
+    from pak_tool import PAKTool
+    PAKTool(work_dir.joinpath('synthetic.pak'))
+    return [work_dir.joinpath('synthetic.pak')]
+
+
+def stage_anb_parse(work_dir):
+    from anbjson import ANBToJSON
+    anb_files = anb_sources(work_dir)
+    for anb_file in anb_files:
+        ANBToJSON(anb_file)
+    return anb_files
+
+
+def stage_anb_unpack(work_dir):
+    from anb_unpack import ANBUnpack
+    anb_files = anb_sources(work_dir)
+    for anb_file in anb_files:
+        ANBUnpack(anb_file)
+    return anb_files
+
+
+def stage_anb_pack(work_dir):
+    from anb_pack import ANBPack
+    anb_files = anb_sources(work_dir)
+    for anb_file in anb_files:
+        ANBPack(anb_file.with_suffix(''))
+        # Put the rebuilt file back so the .pak repack picks it up.
+        anb_file.with_suffix('').joinpath(anb_file.name).replace(anb_file)
+    return anb_files
+
+
+def stage_pak_pack(work_dir):
+    from pak_tool import PAKTool
+    PAKTool(work_dir.joinpath('synthetic'))
+    return [work_dir.joinpath('synthetic', 'synthetic.pak')]
+
+
+STAGES = {
+    'pak_unpack': stage_pak_unpack,
+    'anb_parse': stage_anb_parse,
+    'anb_unpack': stage_anb_unpack,
+    'anb_pack': stage_anb_pack,
+    'pak_pack': stage_pak_pack,
+}
+
+
+def anb_sources(work_dir):
+    return sorted(work_dir.joinpath('synthetic').rglob('*.anb'))
+
+
+def run_stage(name, work_dir):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        files = STAGES[name](work_dir)
+        seconds = time.perf_counter() - start
+    size = sum(file.stat().st_size for file in files)
+    return {"seconds": seconds, "bytes": size, "bytes_per_second": size / seconds, "peak_rss": peak_rss()}
+
+
+def run_suite(args):
+    results = {"config": {"anbs": args.anbs, "frames": args.frames, "size": args.size, "python": platform.python_version()}, "stages": {}}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = Path(temp_dir)
+        write_pak(work_dir.joinpath('synthetic.pak'), args.anbs, args.anbs, seed=args.seed, frame_count=args.frames,
+                  sequence_count=max(1, args.frames // 8), frames_per_sequence=8, width=args.size, height=args.size)
+
+        for name in STAGES:
+            with ProcessPoolExecutor(1) as pool:
+                result = pool.submit(run_stage, name, work_dir).result()
+            results["stages"][name] = result
+            peak = f"{result['peak_rss'] / (1 << 20):8.1f} MiB" if result['peak_rss'] else ' ' * 12
+            print(f"{name:<12} {result['seconds']:8.3f}s {result['bytes_per_second'] / (1 << 20):10.2f} MiB/s {peak}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    if baseline["config"] != results["config"]:
+        print("Warning: baseline was recorded with a different configuration")
+    for name, result in results["stages"].items():
+        if name not in baseline["stages"]:
+            continue
+        baseline_seconds = baseline["stages"][name]["seconds"]
+        ratio = result["seconds"] / baseline_seconds
+        regressed = ratio > 1 + threshold and result["seconds"] - baseline_seconds > MIN_REGRESSION_SECONDS
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<12} {ratio:8.2f}x baseline{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--anbs', type=int, default=16)
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--size', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', type=Path, help="baseline JSON to compare against")
+    parser.add_argument('--update-baseline', action='store_true', help="write this run to --baseline instead of comparing")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown per stage, 0.25 = 25%%")
+    parser.add_argument('--output', type=Path, help="write this run's results as JSON")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        if args.update_baseline or not args.baseline.exists():
+            args.baseline.write_text(json.dumps(results, indent=2))
+            print(f"Log: Wrote baseline {args.baseline}")
+        elif compare(results, json.loads(args.baseline.read_text()), args.threshold):
+            sys.exit(1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Compares the in-process wfLZ codec against the extractor.exe subprocess
+# path on every texture of a real .anb file.
+#
+#   python benchmarks/bench_wflz.py FILE.anb [--repeat N]
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT.joinpath('include')))
+
+from anbjson import ANBToJSON
+import wflz
+
+EXTRACTOR = ROOT.joinpath('include', 'wflz_extractor', 'extractor.exe')
+
+
+def get_textures(node, textures):
+    if node['type'] == 1:
+        textures.append(node['body']['wflz']['body'])
+    for child in node['children']:
+        get_textures(child, textures)
+    return textures
+
+
+def extractor_command():
+    if os.name == 'nt':
+        return [str(EXTRACTOR)]
+    if shutil.which('wine'):
+        return ['wine', str(EXTRACTOR)]
+    return None
+
+
+def bench_native(textures, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in textures:
+            wflz.decompress(data)
+    return time.perf_counter() - start
+
+
+def bench_native_compress(images, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for image_data in images:
+            wflz.compress(image_data)
+    return time.perf_counter() - start
+
+
+def bench_subprocess(textures, repeat, command):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        wflz_file_name = Path(temp_dir).joinpath('frame.wflz')
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for data in textures:
+                wflz_file_name.write_bytes(data)
+                subprocess.run(command + [str(wflz_file_name)], check=True, stdout=subprocess.DEVNULL)
+                wflz_file_name.with_suffix('.dat').read_bytes()
+                os.remove(wflz_file_name.with_suffix('.dat'))
+                os.remove(wflz_file_name)
+        return time.perf_counter() - start
+
+
+def bench_subprocess_compress(images, repeat, command):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image_data_file_name = Path(temp_dir).joinpath('frame.dat')
+        wflz_file_name = image_data_file_name.with_suffix('.wflz')
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for image_data in images:
+                image_data_file_name.write_bytes(image_data)
+                subprocess.run(command + [str(image_data_file_name), str(len(image_data))], check=True, stdout=subprocess.DEVNULL)
+                compression_size = wflz.get_compressed_size(wflz_file_name.read_bytes())
+                subprocess.run(command + [str(image_data_file_name), str(compression_size)], check=True, stdout=subprocess.DEVNULL)
+                wflz_file_name.read_bytes()
+                os.remove(wflz_file_name)
+                os.remove(image_data_file_name)
+        return time.perf_counter() - start
+
+
+def report(label, seconds, frames, raw_bytes):
+    print(f"{label:<12} {frames / seconds:10.1f} frames/s {raw_bytes / seconds / 2**20:10.2f} MiB/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    textures = get_textures(ANBToJSON(args.filename).metadata['Node'], [])
+    frames = len(textures) * args.repeat
+    raw_bytes = sum(wflz.get_decompressed_size(data) for data in textures) * args.repeat
+    print(f"Log: {len(textures)} texture(s), {raw_bytes // args.repeat} decompressed bytes per pass")
+
+    images = [bytes(wflz.decompress(data)) for data in textures]
+    command = extractor_command()
+
+    print("Decompress")
+    report('native', bench_native(textures, args.repeat), frames, raw_bytes)
+    if command:
+        report('subprocess', bench_subprocess(textures, args.repeat, command), frames, raw_bytes)
+
+    print("Compress")
+    report('native', bench_native_compress(images, args.repeat), frames, raw_bytes)
+    if command:
+        report('subprocess', bench_subprocess_compress(images, args.repeat, command), frames, raw_bytes)
+
+    if command is None:
+        print("Log: Skipped extractor.exe, it needs Windows or wine.")
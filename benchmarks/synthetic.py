@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Builds structurally valid synthetic .anb and .pak files so the benchmarks
+# never need real game assets.
+#
+#   python benchmarks/synthetic.py OUT.anb [--frames N] [--sequences N] ...
+#   python benchmarks/synthetic.py OUT.pak [--anbs N] [--files N] [--frames N] ...
+
+import argparse
+import random
+import sys
+import zlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.joinpath('include')))
+
+from anb_layout import ANBLayout
+from pak_archive import PakWriter
+from node_structs import VertexPieceFields
+import wflz
+
+
+def make_node(node_type, body, children=()):
+    return {"type": node_type, "num_children": len(children), "child_pointer": 0, "body": body, "children": list(children)}
+
+
+def make_image(width, height, rnd):
+    # An opaque gradient rectangle on a transparent background, which is
+    # roughly how sprite frames compress.
+    left, top = rnd.randrange(width // 4 + 1), rnd.randrange(height // 4 + 1)
+    right, bottom = width - rnd.randrange(width // 4 + 1), height - rnd.randrange(height // 4 + 1)
+    tint = rnd.randrange(256)
+
+    image = bytearray(width * height * 4)
+    for y in range(top, bottom):
+        row = bytes(value for x in range(left, right) for value in ((x * 8 + tint) & 0xFF, (y * 4) & 0xFF, tint, 0xFF))
+        image[(y * width + left) * 4:(y * width + right) * 4] = row
+    return bytes(image)
+
+
+def make_pieces(width, height, pieces_per_side):
+    piece_width, piece_height = -(-width // pieces_per_side), -(-height // pieces_per_side)
+    pieces = []
+    for texY in range(0, height, piece_height):
+        for texX in range(0, width, piece_width):
+            piece = (float(texX - width // 2), float(texY - height), texX, texY, min(piece_width, width - texX), min(piece_height, height - texY))
+            pieces.append(dict(zip(VertexPieceFields, piece)))
+    return pieces
+
+
+def build_anb(frame_count=64, sequence_count=8, frames_per_sequence=8, width=64, height=64, pieces_per_side=2, seed=0):
+    rnd = random.Random(seed)
+
+    frames = []
+    for _ in range(frame_count):
+        wflz_data = wflz.compress(make_image(width, height, rnd))
+        texture = make_node(1, {"width": width, "height": height, "flags": 0, "padding": 0, "data_offset": 0,
+                                "wflz": {"flag": 0, "size": len(wflz_data), "body": wflz_data}})
+        pieces = make_pieces(width, height, pieces_per_side)
+        vertex = make_node(2, {"num_verts": len(pieces), "flags": 0, "data_offset": 0, "hash_flag": 0, "hash_size": 0, "pieces": pieces})
+        frames.append(make_node(10, {"minx": -width / 2, "maxx": width / 2, "miny": -float(height), "maxy": 0.0}, [texture, vertex]))
+
+    sequences = []
+    for sequence_index in range(sequence_count):
+        sequence_frames = [make_node(11, {"frame": (sequence_index * frames_per_sequence + index) % frame_count, "delay": 0.1})
+                           for index in range(frames_per_sequence)]
+        sequences.append(make_node(12, {"hash_name": 0x10000 + sequence_index, "frame_count": frames_per_sequence}, sequence_frames))
+
+    string = 'synthetic'
+    meta = make_node(9, {"hashname_pointer": 0, "hash_flag": 0, "hash_size": 8, "hash": b'metatabl'}, [
+        make_node(8, {"str_length": len(string), "padding": 0, "string_offset": 0, "string_flag": 0, "string_size": len(string), "string": string}),
+        make_node(5, {"x": 1.0, "y": 2.0, "z": 0.0, "padding": 0}),
+    ])
+
+    hash = b'synthetic_animation'
+    animation = make_node(13, {"sequence_count": sequence_count, "frame_count": frame_count, "single_texture": 0, "palette_index": 0,
+                               "hashname_pointer": 0, "hash_flag": 0, "hash_size": len(hash), "hash": hash}, [meta] + sequences + frames)
+
+    return {"file_header": {"sig": 'YCSN', "fixup": 0, "version": 1, "pad1": 0, "pad2": 0}, "Node": make_node(0, {}, [animation])}
+
+
+def write_anb(filename, metadata):
+    Path(filename).write_bytes(ANBLayout(metadata).build())
+
+
+def write_pak(filename, anb_count=8, file_count=8, file_size=4096, seed=0, **anb_options):
+    # .anb entries plus opaque files, spread over a few folders the way game
+    # archives are.
+    rnd = random.Random(seed)
+    writer = PakWriter()
+    for index in range(anb_count):
+        name = f"sprites/group_{index % 4}/synthetic_{index}.anb"
+        data = ANBLayout(build_anb(seed=seed + index, **anb_options)).build()
+        writer.add_bytes(name, {"filename_hash": zlib.crc32(name.encode()), "flags": 0, "specials": 0}, data)
+    for index in range(file_count):
+        name = f"data/file_{index}.bin"
+        data = bytes(rnd.getrandbits(8) for _ in range(rnd.randrange(1, file_size + 1)))
+        writer.add_bytes(name, {"filename_hash": zlib.crc32(name.encode()), "flags": 0, "specials": 0}, data)
+    writer.write(filename)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename')
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--sequences', type=int, default=8)
+    parser.add_argument('--frames-per-sequence', type=int, default=8)
+    parser.add_argument('--size', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--anbs', type=int, default=8, help=".anb entries in a .pak")
+    parser.add_argument('--files', type=int, default=8, help="other entries in a .pak")
+    args = parser.parse_args()
+
+    if args.filename.endswith('.pak'):
+        write_pak(args.filename, args.anbs, args.files, seed=args.seed, frame_count=args.frames, sequence_count=args.sequences,
+                  frames_per_sequence=args.frames_per_sequence, width=args.size, height=args.size)
+    else:
+        write_anb(args.filename, build_anb(args.frames, args.sequences, args.frames_per_sequence, args.size, args.size, seed=args.seed))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.joinpath('include')))
+from catalog import Catalog, CATALOG_NAME
+from tool_log import logger, setup_logging, add_logging_arguments
+
+
+class CatalogTool:
+    def __init__(self, args):
+        with Catalog(args.db) as catalog:
+            if args.command == 'index':
+                catalog.index(args.game_dir, args.anbs)
+            elif args.command == 'find':
+                rows = catalog.find(args.pattern, args.sequence)
+                for archive_path, name, size in rows:
+                    print(f"{archive_path}: {name} ({size} bytes)")
+                logger.info(f"{len(rows)} match(es).")
+            elif args.command == 'extract':
+                extracted = catalog.extract(args.pattern, args.output, args.archive)
+                logger.info(f"Extracted {len(extracted)} file(s) to {args.output}.")
+
+
+if __name__ == '__main__':
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', default=CATALOG_NAME, help="catalog database file")
+    add_logging_arguments(common)
+
+    parser = argparse.ArgumentParser(description="Index every .pak in a game directory and find or extract single entries.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = commands.add_parser('index', parents=[common], help="scan .pak files, skipping those unchanged since the last scan")
+    index_parser.add_argument('game_dir')
+    index_parser.add_argument('--anbs', action='store_true', help="also record the sequences and texture sizes of every .anb")
+
+    find_parser = commands.add_parser('find', parents=[common], help="list entries by name, or the .anb files holding a sequence")
+    find_parser.add_argument('pattern', nargs='?', help="entry name or glob pattern, e.g. '*knight*.anb'")
+    find_parser.add_argument('--sequence', type=int, metavar='HASH', help="sequence hash_name to look for (needs index --anbs)")
+
+    extract_parser = commands.add_parser('extract', parents=[common], help="copy entries straight out of their .pak")
+    extract_parser.add_argument('pattern', help="entry name or glob pattern")
+    extract_parser.add_argument('--archive', help="only extract from this .pak")
+    extract_parser.add_argument('--output', default='.', help="directory to extract into, entries land in OUTPUT/<pak name>/")
+
+    args = parser.parse_args()
+    setup_logging(args.verbose, args.quiet)
+
+    try:
+        CatalogTool(args)
+    except ValueError as error:
+        logger.error(str(error))
+        sys.exit(1)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Sprite-sheet layout for unpacked .anb folders: every unique frame goes into
+# one or a few atlas PNGs, atlas.json records where each frame index sits and
+# which frames every sequence uses.
+#
+#   {"atlases": [{"file": "atlas_0.png", "width": W, "height": H}, ...],
+#    "frames": {"<frame index>": {"atlas": 0, "x": X, "y": Y, "width": W, "height": H}, ...},
+#    "sequences": {"<hash name>": [<frame index>, ...], ...}}
+
+import json
+from pathlib import Path
+
+from PIL import Image
+
+ATLAS_INDEX_NAME = 'atlas.json'
+ATLAS_NAME = 'atlas_{}.png'
+MAX_ATLAS_SIZE = 4096
+ATLAS_PADDING = 2
+
+
+def plan_atlases(sizes, max_size=MAX_ATLAS_SIZE, padding=ATLAS_PADDING):
+    # Shelf packing, tallest frames first. Returns a rectangle per size and
+    # the dimensions of every atlas.
+    rects = [None] * len(sizes)
+    atlases = []
+    x = y = shelf_height = 0
+    for index in sorted(range(len(sizes)), key=lambda index: -sizes[index][1]):
+        width, height = sizes[index]
+        if atlases and x + width > max_size:
+            x, y, shelf_height = 0, y + shelf_height + padding, 0
+        if not atlases or y + height > max_size:
+            atlases.append([0, 0])
+            x = y = shelf_height = 0
+
+        rects[index] = {"atlas": len(atlases) - 1, "x": x, "y": y, "width": width, "height": height}
+        atlases[-1] = [max(atlases[-1][0], x + width), max(atlases[-1][1], y + height)]
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+    return rects, atlases
+
+
+def remove_atlases(directory):
+    # Left over from an atlas unpack, the index would take precedence over
+    # frame images on pack and the sheets would count as edited images.
+    directory = Path(directory)
+    if directory.joinpath(ATLAS_INDEX_NAME).exists():
+        directory.joinpath(ATLAS_INDEX_NAME).unlink()
+    for path in directory.glob(ATLAS_NAME.format('*')):
+        path.unlink()
+
+
+class ANBAtlas:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.index = json.loads(self.directory.joinpath(ATLAS_INDEX_NAME).read_text())
+        self.images = {}
+
+    @staticmethod
+    def exists(directory):
+        return Path(directory).joinpath(ATLAS_INDEX_NAME).exists()
+
+    def frame_key(self, frame_index):
+        rect = self.index['frames'][str(frame_index)]
+        return (rect['atlas'], rect['x'], rect['y'], rect['width'], rect['height'])
+
+    def frame_image(self, frame_index):
+        atlas, x, y, width, height = self.frame_key(frame_index)
+        if atlas not in self.images:
+            self.images[atlas] = Image.open(self.directory.joinpath(self.index['atlases'][atlas]['file'])).convert('RGBA')
+        return self.images[atlas].crop((x, y, x + width, y + height))
+
+    def close(self):
+        for image in self.images.values():
+            image.close()
+        self.images.clear()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Lays out an .anb from its metadata tree. One walk over the nodes assigns
+# every node, child table, hash, string, wfLZ blob and vertex chunk an offset
+# inside its region, build() then writes the whole file into one pre-sized
+# buffer. All state lives on the instance, so layouts can run in threads.
+#
+# Regions, in file order:
+#   nodes     file header, root, then each node followed by its parent's child
+#             table once the last sibling is placed
+#   hashes    MetaString strings, MetaTable and Animation hashes
+#   textures  each Texture's wfLZ data followed by its Vertex pieces
+
+import struct
+
+from anbjson import HEADER_SIZE
+from node_structs import NodeBodyStructs, NodeHeaderStruct, BlobHeaderStruct, VertexPieceStruct, VertexPieceFields
+
+NODES, HASHES, TEXTURES = range(3)
+BLOB_ALIGNMENT = 8
+
+
+class PlannedNode:
+    __slots__ = ('node', 'offset', 'child_pointer', 'pointer_field', 'blob')
+
+    def __init__(self, node, offset):
+        self.node = node
+        self.offset = offset
+        self.child_pointer = 0
+        self.pointer_field = None
+        self.blob = None
+
+
+class ANBLayout:
+    def __init__(self, metadata):
+        self.metadata = metadata
+        self.root = PlannedNode(metadata['Node'], HEADER_SIZE)
+        self.planned = {}
+        self.nodes = []
+        self.blobs = ([], [], [])
+        self.sizes = [HEADER_SIZE + NodeHeaderStruct.size, 0, 0]
+
+        self.place_children(self.root)
+
+    @property
+    def size(self):
+        return sum(self.sizes)
+
+    def region_offset(self, region):
+        return sum(self.sizes[:region])
+
+    def place_children(self, parent):
+        children = parent.node['children']
+        for child in children:
+            planned = self.place(child)
+            if child is children[-1]:
+                # The parent's child table follows its last child's body.
+                parent.child_pointer = self.sizes[NODES]
+                self.sizes[NODES] += 8 * len(children)
+            self.place_children(planned)
+
+    def place(self, node):
+        planned = PlannedNode(node, self.sizes[NODES])
+        self.planned[id(node)] = planned
+        self.nodes.append(planned)
+
+        body_struct = NodeBodyStructs.get(node['type'])
+        self.sizes[NODES] += NodeHeaderStruct.size + (body_struct[0].size if body_struct else 0)
+
+        body = node['body']
+        if node['type'] == 1:
+            wflz = body['wflz']
+            self.add_blob(planned, 'data_offset', TEXTURES, wflz['flag'], wflz['size'], wflz['body'])
+        elif node['type'] == 2:
+            pieces = b''.join(VertexPieceStruct.pack(*[piece[field] for field in VertexPieceFields]) for piece in body['pieces'])
+            self.add_blob(planned, 'data_offset', TEXTURES, body['hash_flag'], body['hash_size'], pieces)
+        elif node['type'] == 8:
+            self.add_blob(planned, 'string_offset', HASHES, body['string_flag'], body['string_size'], body['string'].encode('utf-8'))
+        elif node['type'] in (9, 13) and 'hash' in body:
+            self.add_blob(planned, 'hashname_pointer', HASHES, body['hash_flag'], body['hash_size'], body['hash'])
+        return planned
+
+    def add_blob(self, planned, pointer_field, region, flag, size, data):
+        planned.pointer_field = pointer_field
+        planned.blob = (region, self.sizes[region])
+        self.blobs[region].append((self.sizes[region], flag, size, data))
+        self.sizes[region] += BlobHeaderStruct.size + len(data) + (-len(data) % BLOB_ALIGNMENT)
+
+    def build(self):
+        out = bytearray(self.size)
+
+        header = self.metadata['file_header']
+        struct.pack_into('<4sIIIQ', out, 0, b'YCSN', header['fixup'], header['version'], header['pad1'], header['pad2'])
+
+        for planned in [self.root] + self.nodes:
+            node = planned.node
+            NodeHeaderStruct.pack_into(out, planned.offset, node['type'], len(node['children']), planned.child_pointer)
+            if node['children']:
+                struct.pack_into(f'<{len(node["children"])}Q', out, planned.child_pointer, *[self.planned[id(child)].offset for child in node['children']])
+
+            if node['type'] in NodeBodyStructs:
+                body = node['body']
+                if planned.blob:
+                    region, blob_offset = planned.blob
+                    body = dict(body, **{planned.pointer_field: self.region_offset(region) + blob_offset})
+                body_struct, fields = NodeBodyStructs[node['type']]
+                body_struct.pack_into(out, planned.offset + NodeHeaderStruct.size, *[body[field] for field in fields])
+
+        for region, blobs in enumerate(self.blobs):
+            base = self.region_offset(region)
+            for blob_offset, flag, size, data in blobs:
+                start = base + blob_offset + BlobHeaderStruct.size
+                BlobHeaderStruct.pack_into(out, start - BlobHeaderStruct.size, flag, size)
+                out[start:start + len(data)] = data
+
+        return out
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# metadata.json keeps the node tree, every binary blob (wfLZ texture data,
+# hashes) goes to metadata.bin and is referenced as {"blob": [offset, size]}.
+# Older metadata.json files with base64 blobs inline are still read.
+
+import base64
+import json
+import mmap
+from pathlib import Path
+
+METADATA_NAME = 'metadata.json'
+BLOBS_NAME = 'metadata.bin'
+BLOB_ALIGNMENT = 8
+
+
+class BlobWriter:
+    def __init__(self, file):
+        self.file = file
+        self.offset = 0
+
+    def __call__(self, blob):
+        if not isinstance(blob, (bytes, bytearray, memoryview)):
+            raise TypeError(f"Object of type {type(blob).__name__} is not JSON serializable")
+        offset, size = self.offset, len(blob)
+        padding = bytes(-size % BLOB_ALIGNMENT)
+        self.file.write(blob)
+        self.file.write(padding)
+        self.offset += size + len(padding)
+        return {"blob": [offset, size]}
+
+
+def save_metadata(directory, metadata):
+    directory = Path(directory)
+    with open(directory.joinpath(BLOBS_NAME), 'wb') as blobs, open(directory.joinpath(METADATA_NAME), 'w') as file:
+        json.dump(dict(metadata, blobs=BLOBS_NAME), file, default=BlobWriter(blobs))
+
+
+def load_metadata(directory):
+    directory = Path(directory)
+    blobs = map_blobs(directory.joinpath(BLOBS_NAME))
+
+    def object_hook(obj):
+        if len(obj) == 1 and 'blob' in obj:
+            offset, size = obj['blob']
+            return blobs[offset:offset + size]
+        return obj
+
+    with open(directory.joinpath(METADATA_NAME)) as file:
+        metadata = json.load(file, object_hook=object_hook)
+    if 'blobs' not in metadata:
+        decode_legacy_blobs(metadata['Node'])
+    return metadata
+
+
+def map_blobs(filename):
+    # Blobs are only paged in when a packer actually touches them.
+    if not filename.exists() or filename.stat().st_size == 0:
+        return memoryview(b'')
+    with open(filename, 'rb') as file:
+        return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def decode_legacy_blobs(node):
+    body = node['body']
+    if 'hash' in body and isinstance(body['hash'], str):
+        body['hash'] = base64.b64decode(body['hash'])
+    if 'wflz' in body and isinstance(body['wflz']['body'], str):
+        body['wflz']['body'] = base64.b64decode(body['wflz']['body'])
+    for child in node['children']:
+        decode_legacy_blobs(child)
@@ -8,120 +8,121 @@ except:
 	print("Error: Couldn't find the pillow library! Try running 'pip install pillow'")
 	sys.exit(-1)
 
-import os
-import struct
 from pathlib import Path
-import glob
-import json
-import base64
-NodeTypeName = {
-	0 : 'Node',
-	1 : 'Texture',
-	2 : 'Vertex',
-	3 : 'Meta',
-	4 : 'MetaScalar',
-	5 : 'MetaPoint',
-	6 : 'MetaAnchor',
-	7 : 'MetaRect',
-	8 : 'MetaString',
-	9 : 'MetaTable',
-	10 :'Frame',
-	11 :'SequenceFrame',
-	12 :'Sequence',
-	13 :'Animation'
-}
-NodeStructureSize = {
-	'Node': 24,
-	'Texture': 24,
-	'Vertex': 16,
-	'MetaScalar': 8,
-	'MetaPoint': 16,
-	'MetaAnchor': 16,
-	'MetaRect': 32,
-	'MetaString': 16,
-	'MetaTable': 8,
-	'Frame': 16,
-	'SequenceFrame': 8,
-	'Sequence': 8,
-	'Animation': 24,
-}
-TraversedNodes = {}
+import hashlib
+from collections import Counter
+import wflz
+from anb_metadata import load_metadata
+from anb_layout import ANBLayout
+from anb_atlas import ANBAtlas
+from frame_format import find_frame, read_frame, FrameDigests
+from profiler import Profiler
+from tool_log import logger
 
 class ANBPack:
-    def __init__(self, folder):
+    # With write=False the rebuilt .anb is only kept in self.data.
+    def __init__(self, folder, cache=None, profiler=None, write=True):
         self.directory = Path(folder)
-        metadata_dir = self.directory.joinpath('metadata.json')
-        self.metadata = json.loads(metadata_dir.read_text())
-        self.hash_chunk = b''
-        self.hash_chunk_size = 0
-        self.main_body_node_size = 0
-        self.previous_wflz_size = 0
+        self.cache = cache
+        self.profiler = profiler or Profiler(enabled=False)
+        with self.profiler.stage('parse'):
+            self.metadata = load_metadata(self.directory)
         
-        os.chdir(self.directory)
-        sequence_hashes = [d for d in glob.glob('*') if Path(d).is_dir()]
         frames = self.get_nodes(10, self.metadata['Node'], [])
-        sequences = {}
         old_sequences = self.get_nodes(12, self.metadata['Node']['children'][0], [])
-        print(f"Log: Packing {len(old_sequences)} Animation(s)..")
-        new_image_sizes = {}
-        
-        for sequence_hash in sequence_hashes:
-            sequences[sequence_hash] = {}
-            sequences_path = Path(self.directory.joinpath(sequence_hash))
-            os.chdir(sequences_path)
-            
-            for image in glob.glob("*.png"):
-                (width, height) = Image.open(image).size
-                new_image_sizes[image] = {"width": self.align_image(width, 8), "height": self.align_image(height, 8)}
-                compressed_image_path = sequences_path.joinpath(image)
-                compressed_wflz = self.compress_image(compressed_image_path)
-                sequences[sequence_hash][Path(image).stem] = compressed_wflz
-                
+        logger.info(f"Packing {len(old_sequences)} Animation(s)..")
+        
+        # Every sequence directory holds its own copy of the frames it uses.
+        # Each frame index gets one copy (the edited one if they differ),
+        # identical content is compressed once and shared. An atlas folder
+        # keys frames by their rectangle instead.
+        atlas = ANBAtlas(self.directory) if ANBAtlas.exists(self.directory) else None
+        compressed_images = {}
+        image_hashes = {}
+        frame_copies = {} if atlas else self.find_frame_copies(old_sequences)
+        digests = None if atlas else FrameDigests.load(self.directory)
+        references = 0
         for sequence in old_sequences:
             for sequence_frame in self.get_nodes(11, sequence, []):
+                references += 1
                 frame_index = sequence_frame['body']['frame']
                 
                 frame = frames[frame_index]
                 texture = [n for n in frame['children'] if n['type'] == 1][0]
-                vertex = [n for n in frame['children'] if n['type'] == 2][0]
                 
-                image_width = new_image_sizes[f"frame_{frame_index}.png"]["width"]
-                image_height = new_image_sizes[f"frame_{frame_index}.png"]["height"]
-                
-                vertex_chunk = self.build_vertex_chunk(vertex, image_width, image_height, frame_index)
-                                
-                new_sequence = sequences[str(sequence['body']['hash_name'])]
-                wflz_data = new_sequence[f"frame_{frame_index}"]
+                if atlas:
+                    image_hash = atlas.frame_key(frame_index)
+                    if image_hash not in compressed_images:
+                        compressed_images[image_hash] = self.compress_image(atlas.frame_image(frame_index))
+                else:
+                    if frame_index not in image_hashes:
+                        image_hashes[frame_index] = self.pick_frame_copy(frame_index, frame_copies[frame_index], digests)
+                    compressed_image_path, image_hash = image_hashes[frame_index]
+                    if image_hash not in compressed_images:
+                        compressed_images[image_hash] = self.compress_image(compressed_image_path)
+                wflz_data = compressed_images[image_hash]
                 
                 #texture['body']['width'] = image_width
                 #texture['body']['height'] = image_height
                 texture['body']['wflz']['size'] = len(wflz_data)
-                texture['body']['wflz']['body'] = wflz_data + bytes((self.align(len(wflz_data), 8) - len(wflz_data))) + vertex_chunk
+                texture['body']['wflz']['body'] = wflz_data
                 
-        with open(self.directory.joinpath(self.directory.name + '.anb'), 'wb') as file:
-            header = self.metadata['file_header']
-            
-            file.write(b'YCSN')
-            file.write(struct.pack('<IIIQ', header["fixup"], header["version"], header["pad1"], header["pad2"]))
-            
-            node = self.metadata['Node']
-            file.write(struct.pack('<IIQ', node["type"], node["num_children"], node["child_pointer"]))
-            
-            self.get_chunk_sizes(node)
-            
-            self.traverse(file, node['children'][0], node)
-            file.write(self.hash_chunk)
-            
-            for texture in self.get_nodes(1, self.metadata['Node']['children'][0], []):
-                file.write(struct.pack('<I', texture['body']['wflz']['flag']))
-                file.write(struct.pack('<I', texture['body']['wflz']['size']))
-                file.write(texture['body']['wflz']['body'])
+        if atlas:
+            atlas.close()
+        logger.info(f"Compressed {len(compressed_images)} unique frame(s) for {references} reference(s), saved {references - len(compressed_images)} compression(s).")
         
-        print("Log: Finished.")
-                
-    def align(self, v: int, m: int):
-        mask = m - 1
-        return (v + mask) & ~mask    
+        if self.cache:
+            self.cache.trim()
+            logger.info(self.cache.report())
+        
+        self.data = self.build()
+        if write:
+            with self.profiler.stage('write', len(self.data)):
+                with open(self.directory.joinpath(self.directory.name + '.anb'), 'wb') as file:
+                    file.write(self.data)
+        
+        logger.info("Finished.")
+    
+    def find_frame_copies(self, sequences):
+        # Image files of every frame index, one per sequence directory using it.
+        frame_copies = {}
+        for sequence in sequences:
+            sequences_path = self.directory.joinpath(str(sequence['body']['hash_name']))
+            for sequence_frame in self.get_nodes(11, sequence, []):
+                copies = frame_copies.setdefault(sequence_frame['body']['frame'], [])
+                image_path = find_frame(sequences_path, sequence_frame['body']['frame'])
+                if image_path not in copies:
+                    copies.append(image_path)
+        return frame_copies
+    
+    def pick_frame_copy(self, frame_index, copies, digests):
+        # (path, content hash) of the copy to pack. When copies differ, the
+        # one edited since the unpack wins (by frame_digests.json, or else the
+        # single copy that differs from all the others), anything ambiguous is
+        # an error rather than a silently dropped edit.
+        hashes = {copy: hashlib.sha1(copy.read_bytes()).digest() for copy in copies}
+        if len(set(hashes.values())) == 1:
+            return copies[0], hashes[copies[0]]
+        
+        if digests is not None:
+            edited = [copy for copy in copies if digests.changed(copy)] or copies
+        else:
+            counts = Counter(hashes.values())
+            edited = [copy for copy in copies if counts[hashes[copy]] == 1]
+            if len(counts) != 2 or len(edited) != 1:
+                edited = copies
+        
+        if len({hashes[copy] for copy in edited}) != 1:
+            names = ', '.join(str(copy.relative_to(self.directory)) for copy in edited)
+            raise ValueError(f"Frame {frame_index} was edited differently in {names}, make the copies match")
+        logger.warning(f"Frame {frame_index} differs between sequences, packing the edited {edited[0].relative_to(self.directory)}")
+        return edited[0], hashes[edited[0]]
+    
+    def build(self):
+        with self.profiler.stage('layout') as stage:
+            data = ANBLayout(self.metadata).build()
+            stage.bytes = len(data)
+        return data
             
     def get_nodes(self, node_type, node, nodes):
         if node['type'] == node_type:
@@ -130,90 +131,21 @@ class ANBPack:
             self.get_nodes(node_type, _node, nodes)
         return nodes
     
-    def build_vertex_chunk(self, vertex, image_width, image_height, frame_index):
-        
-        vertex_chunk = b''
-        vertex_chunk += struct.pack('<I', vertex["body"]["hash_flag"])
-        vertex_chunk += struct.pack('<I', vertex["body"]["hash_size"])
-        
-        for piece in vertex["body"]["pieces"]:
-            
-            vertex_chunk += struct.pack('<f',piece["posX"])
-            vertex_chunk += struct.pack('<f',piece["posY"])
-            
-            vertex_chunk += struct.pack('<H',piece["texX"]) #-1, each iteration removes 1 # 2 Bytes
-            vertex_chunk += struct.pack('<H',piece["texY"]) #-1, each iteration removes 1 # 2 Bytes
-            
-            vertex_chunk += struct.pack('<H',piece["width"])
-            vertex_chunk += struct.pack('<H',piece["height"])
-   
-        return vertex_chunk
-        
-    
-    def traverse(self, file, node, parent):
-        self.unpack_node(node, file, parent)
-    
-        TraversedNodes[NodeTypeName[parent['type']]] = TraversedNodes.get(NodeTypeName[parent["type"]], 0) + 1
-        if TraversedNodes[NodeTypeName[parent["type"]]] >= parent["num_children"]:
-            TraversedNodes[NodeTypeName[parent["type"]]] = 0
-            for child in parent['children']:
-                file.write(struct.pack('<Q', child['offset']))
-
-        for _node in node['children']:
-            self.traverse(file, _node, node)
-            
-    def get_chunk_sizes(self, node):
-        self.main_body_node_size += NodeStructureSize[NodeTypeName[node['type']]]
-        self.main_body_node_size += 16
-        self.main_body_node_size += 8 * node['num_children']
-  
-        if 'hash_size' in node['body'] and NodeTypeName[node['type']] != 'Vertex' :
-            self.hash_chunk_size += 4 # Flag
-            self.hash_chunk_size += 4 # Size
-            self.hash_chunk_size += node['body']['hash_size'] + (self.align(node['body']['hash_size'], 8) - node['body']['hash_size'])
-            
-        if 'string_size' in node['body']:
-            self.hash_chunk_size += 4 # Flag
-            self.hash_chunk_size += 4 # Size
-            self.hash_chunk_size += node['body']['string_size']
-            self.hash_chunk_size += self.align(node["body"]["string_size"], 8) - node["body"]["string_size"]
-            
-        for _node in node['children']:
-            self.get_chunk_sizes(_node)
-            
     def compress_image(self, image_name):
-        _image = Image.open(image_name) 
-        padded_image = _image #self.get_padded_image(_image.width, _image.height, _image)
-        
-        width, height = padded_image.size
-        pixels = list(padded_image.getdata())
-        
-        pixels = [pixels[i * width:(i + 1) * width] for i in range(height)]
-        compression_size = width * height * 4
-        
-        image_data_file_name = image_name.with_suffix('.dat')
-        with open(image_data_file_name, 'wb') as file:
-            for row in pixels:
-                for r,g,b,a in row:
-                    file.write(struct.pack('<BBBB', r, g, b, a))
-                    
-        
-        image_data_file_name = f'"{str(image_data_file_name)}"'
-    
-        script_dir = os.path.dirname(__file__)
-        full_path = os.path.join(script_dir, "wflz_extractor", "extractor.exe")
-        
-        os.system(full_path + ' ' + image_data_file_name + ' ' + str(compression_size))
-        with open(Path(image_name).with_suffix('.wflz'), 'rb') as file:
-            file.seek(4)
-            compression_size = struct.unpack('<I', file.read(4))[0]
-        os.system(full_path + ' ' + image_data_file_name + ' ' + str(compression_size + 16))
-        wflz_data = Path(image_name).with_suffix('.wflz').read_bytes()
-        
-        os.remove(Path(image_name).with_suffix('.wflz'))
-        os.remove(Path(image_name).with_suffix('.dat'))
+        with self.profiler.stage('decode') as stage:
+            if isinstance(image_name, Image.Image):
+                padded_image = image_name #self.get_padded_image(image_name.width, image_name.height, image_name)
+                if padded_image.mode != 'RGBA':
+                    padded_image = padded_image.convert('RGBA')
+                pixels, width, height = padded_image.tobytes(), padded_image.width, padded_image.height
+            else:
+                pixels, width, height = read_frame(image_name)
+            stage.bytes = len(pixels)
         
-        return wflz_data
+        with self.profiler.stage('compress', len(pixels)):
+            if self.cache:
+                return self.cache.compress(pixels, width, height)
+            return wflz.compress(pixels)
     
     def get_padded_image(self, width, height, image):
         new_width = self.align_image(width, 8)
@@ -231,116 +163,3 @@ class ANBPack:
         if aligned_value < v:
             aligned_value += m
         return aligned_value
-    
-    def unpack_node(self, node, file, parent):
-        _type = NodeTypeName[node['type']]
-        
-        node['offset'] = file.tell()
-        node_chunk_body = struct.pack('<IIQ', node["type"], node["num_children"], node["child_pointer"])
-        
-        if _type == 'Texture':
-            node_chunk_body += struct.pack('<I', node["body"]["width"])
-            node_chunk_body += struct.pack('<I', node["body"]["height"])
-            node_chunk_body += struct.pack('<I', node["body"]["flags"])
-            node_chunk_body += struct.pack('<I', node["body"]["padding"])
-            
-            data_offset = self.main_body_node_size + self.hash_chunk_size + self.previous_wflz_size
-            node_chunk_body += struct.pack('<Q', data_offset)
-
-        if _type == 'Vertex':
-            node_chunk_body += struct.pack('<I', node["body"]["num_verts"])
-            node_chunk_body += struct.pack('<I', node["body"]["flags"])
-            
-            parent_texture = [n for n in parent['children'] if n['type'] == 1][0]
-            parent_vertex = [n for n in parent['children'] if n['type'] == 2][0]
-     
-            self.previous_wflz_size += len(parent_texture['body']['wflz']['body']) + 8
-            offset = 8 + (16 * parent_vertex["body"]["num_verts"])
-            data_offset = (self.main_body_node_size + self.hash_chunk_size + (self.previous_wflz_size - offset))
-            
-            node_chunk_body += struct.pack('<Q', data_offset)
-            
-    
-        if _type == 'MetaPoint':
-            node_chunk_body += struct.pack('<f', node["body"]["x"])
-            node_chunk_body += struct.pack('<f', node["body"]["y"])
-            node_chunk_body += struct.pack('<f', node["body"]["z"])
-            node_chunk_body += struct.pack('<I', node["body"]["padding"])
-
-        if _type == 'MetaAnchor':
-            node_chunk_body += struct.pack('<f', node["body"]["x"])
-            node_chunk_body += struct.pack('<f', node["body"]["y"])
-            node_chunk_body += struct.pack('<f', node["body"]["z"])
-            node_chunk_body += struct.pack('<f', node["body"]["angle"])
-        
-        if _type == 'MetaRect':
-            node_chunk_body += struct.pack('<f', node["body"]["centerx"])
-            node_chunk_body += struct.pack('<f', node["body"]["centery"])
-            node_chunk_body += struct.pack('<f', node["body"]["centerz"])
-            node_chunk_body += struct.pack('<f', node["body"]["extentsx"])
-            node_chunk_body += struct.pack('<f', node["body"]["extentsy"])
-            node_chunk_body += struct.pack('<f', node["body"]["extentsz"])
-            node_chunk_body += struct.pack('<f', node["body"]["anglex"])
-            node_chunk_body += struct.pack('<I', node["body"]["padding"])
-        
-        if _type == 'MetaString':
-            
-            node_chunk_body += struct.pack('<I', node["body"]["str_length"])
-            node_chunk_body += struct.pack('<I', node["body"]["padding"])
-            
-            hash_offset = self.main_body_node_size + len(self.hash_chunk)
-
-            node_chunk_body += struct.pack('<Q', hash_offset)
-            self.hash_chunk += struct.pack('<I', node["body"]["string_flag"])
-            self.hash_chunk += struct.pack('<I', node["body"]["string_size"])
-            
-            hash = node["body"]["string"].encode('utf-8')
-            self.hash_chunk += hash + bytes(self.align(node["body"]["string_size"], 8) - node["body"]["string_size"])
-
-        if _type == 'MetaTable':
-            hashname_pointer = node['body']['hashname_pointer']
-            hash_offset = self.main_body_node_size + len(self.hash_chunk)
-            if hashname_pointer != 0:
-                node_chunk_body += struct.pack('<Q', hash_offset)
-                self.hash_chunk += struct.pack('<I', node["body"]["hash_flag"])
-                self.hash_chunk += struct.pack('<I', node["body"]["hash_size"])
-             
-                hash = base64.b64decode(node["body"]["hash"])
-                self.hash_chunk += hash + bytes(self.align(len(hash), 8) - len(hash))
-            else:
-                node_chunk_body += bytes(8)
-                
-
-        if _type == 'SequenceFrame':
-            node_chunk_body += struct.pack('<I', node["body"]["frame"])
-            node_chunk_body += struct.pack('<f', node["body"]["delay"])
-        
-        if _type == 'Sequence':
-            node_chunk_body += struct.pack('<I', node["body"]["hash_name"])
-            node_chunk_body += struct.pack('<I', node["body"]["frame_count"])
-
-        if _type == 'Animation':
-            node_chunk_body += struct.pack('<I', node["body"]["sequence_count"])
-            node_chunk_body += struct.pack('<I', node["body"]["frame_count"])
-            node_chunk_body += struct.pack('<I', node["body"]["single_texture"])
-            node_chunk_body += struct.pack('<I', node["body"]["palette_index"])
-            
-            #print(node["body"]["palette_index"])
-            
-            node_chunk_body += struct.pack('<Q', self.main_body_node_size)
-            self.hash_chunk += struct.pack('<I', node["body"]["hash_flag"])
-            self.hash_chunk += struct.pack('<I', node["body"]["hash_size"])
-            
-            hash = base64.b64decode(node["body"]["hash"])
-            self.hash_chunk += hash + bytes(self.align(len(hash), 8) - len(hash))
-   
-        if _type == 'Frame':
-            node_chunk_body += struct.pack('<f', node["body"]["minx"])
-            node_chunk_body += struct.pack('<f', node["body"]["maxx"])
-            node_chunk_body += struct.pack('<f', node["body"]["miny"])
-            node_chunk_body += struct.pack('<f', node["body"]["maxy"])
-
-        if _type == 'MetaScalar':
-            node_chunk_body += struct.pack('<Q', node["body"]["unk"])
-            
-        file.write(node_chunk_body)
\ No newline at end of file
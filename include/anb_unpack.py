@@ -3,7 +3,19 @@
 # -*- coding: utf-8 -*-
 
 from anbjson import ANBToJSON
+from anbfile import ANBFile
+from anb_metadata import save_metadata
+from anb_atlas import ATLAS_INDEX_NAME, ATLAS_NAME, plan_atlases, remove_atlases
+from frame_format import frame_name, remove_frames, remove_other_formats, encode_frame, FrameDigests
+from pipeline import Pipeline
+from profiler import Profiler
+from tool_log import logger
+import wflz
 import sys
+import hashlib
+import json
+import os
+import shutil
 
 try:
 	from PIL import Image
@@ -11,23 +23,90 @@ except:
 	print("Error: Couldn't find the pillow library! Try running 'pip install pillow'")
 	sys.exit(-1)
 
-import os
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
 from pathlib import Path
-import base64
-import json
+
+UNPACK_STAGES = ('decompress', 'composite', 'encode', 'write')
+
+def parse_workers(text):
+    # "4" -> 4 workers for every stage, "encode=4,write=2" -> 1 for the rest
+    if text.isdigit():
+        workers = {name: int(text) for name in UNPACK_STAGES}
+    else:
+        workers = {}
+        for part in text.split(','):
+            name, _, count = part.partition('=')
+            if name not in UNPACK_STAGES:
+                raise ValueError(f"unknown stage {name}")
+            workers[name] = int(count)
+    if min(workers.values()) < 1:
+        raise ValueError("every stage needs at least one worker")
+    return workers
+
+def parse_frame_ranges(text):
+    # "3,10-20" -> {3, 10, 11, ..., 20}
+    frames = set()
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        frames.update(range(int(first), int(last or first) + 1))
+    return frames
 
 class ANBUnpack:
-    def __init__(self, filename):
-        self.metadata = ANBToJSON(filename).metadata
+    # filename may also be a buffer holding the whole .anb, for instance an
+    # entry of a mapped .pak, then directory says where the frames go.
+    def __init__(self, filename, atlas=False, profiler=None, sequences=None, frames=None, workers=None, queue_size=None, directory=None, frame_format='png', compress_level=None):
+        self.profiler = profiler or Profiler(enabled=False)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.frame_format = frame_format
+        self.compress_level = compress_level
+        if isinstance(filename, (str, os.PathLike)):
+            self.directory = Path(directory or Path(filename).parent.joinpath(Path(filename).stem))
+            size = Path(filename).stat().st_size
+        elif directory is None:
+            raise ValueError("Unpacking an .anb from memory needs a directory to unpack into")
+        else:
+            self.directory = Path(directory)
+            size = memoryview(filename).nbytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.digests = FrameDigests(self.directory)
+        
+        if sequences is not None or frames is not None:
+            self.unpack_selection(filename, sequences, frames)
+            logger.info("Finished.")
+            return
         
-        self.directory = Path(str(Path(filename).parent) + '\\' + Path(filename).stem)
-        self.directory.mkdir(exist_ok=True)
+        with self.profiler.stage('parse', size):
+            self.metadata = ANBToJSON(filename).metadata
         
         frames = self.get_nodes(10, self.metadata['Node'], [])
         sequences = self.get_nodes(12, self.metadata['Node']['children'][0], [])
         
-        print(f"Log: Unpacking {len(sequences)} Animation(s)..")
+        logger.info(f"Unpacking {len(sequences)} Animation(s)..")
+        
+        if atlas:
+            self.unpack_atlas(frames, sequences)
+        else:
+            self.unpack_frames(frames, sequences)
+        
+        with self.profiler.stage('write'):
+            save_metadata(self.directory, self.metadata)
+            self.digests.save()
+                
+        logger.info("Finished.")
+    
+    def unpack_frames(self, frames, sequences):
+        remove_atlases(self.directory)
         
+        # Sequences often share frames, each unique frame (by content, so
+        # duplicated textures count once too) is decoded once and written
+        # into every sequence directory that references it.
+        unique_frames = {}
+        references = 0
         for sequence in sequences:
             directory_name = str(sequence['body']['hash_name'])
             directory_path = self.directory.joinpath(directory_name)
@@ -35,28 +114,142 @@ class ANBUnpack:
             
             sequence_frames = self.get_nodes(11, sequence, [])
             for sequence_frame in sequence_frames:
+                references += 1
                 frame_index = sequence_frame['body']['frame']
                 frame = frames[frame_index]
                 texture = [n for n in frame['children'] if n['type'] == 1][0]
                 vertex = [n for n in frame['children'] if n['type'] == 2][0]
-  
-                texture_width = texture['body']['width']
-                texture_height = texture['body']['height']
                 
-                wflz_data = base64.b64decode(texture['body']['wflz']['body'])
-                wflz_file_name = directory_path.joinpath(f'frame_{str(frame_index)}.wflz')
-                open(wflz_file_name, 'wb').write(wflz_data)
-                
-                self.extract_wflz(wflz_file_name)
-                self.create_image(wflz_file_name.with_suffix('.dat'), texture_width, texture_height, vertex['body']['pieces'], frame_index)
-                os.remove(wflz_file_name)
+                image_name = frame_name(directory_path, frame_index, self.frame_format)
+                remove_other_formats(image_name)
+                frame_key = self.frame_hash(texture, vertex)
+                image_names = unique_frames.setdefault(frame_key, (texture, vertex, []))[2]
+                if image_name not in image_names:
+                    image_names.append(image_name)
+        
+        stages = (('decompress', self.decompress_frame), ('composite', self.composite_frame),
+                  ('encode', self.encode_frame), ('write', self.write_frame))
+        if self.workers:
+            pipeline = Pipeline([(name, function, self.workers.get(name, 1)) for name, function in stages], self.queue_size)
+            pipeline.run(unique_frames.values())
+            pipeline.report()
+        else:
+            for item in unique_frames.values():
+                for name, function in stages:
+                    item = function(item)
                 
-        with open(self.directory.joinpath('metadata.json'), 'w') as file:
-            json.dump(self.metadata, file)
+        logger.info(f"Decoded {len(unique_frames)} unique frame(s) for {references} reference(s), saved {references - len(unique_frames)} decode(s).")
+    
+    def unpack_atlas(self, frames, sequences):
+        # Frames from a one-image-per-frame unpack, or sheets from a bigger
+        # atlas unpack, would be left behind as images nothing packs.
+        remove_frames(self.directory)
+        remove_atlases(self.directory)
+        
+        unique_frames = {}
+        frame_hashes = {}
+        index = {"atlases": [], "frames": {}, "sequences": {}}
+        references = 0
+        for sequence in sequences:
+            frame_indices = []
+            for sequence_frame in self.get_nodes(11, sequence, []):
+                references += 1
+                frame_index = sequence_frame['body']['frame']
+                frame_indices.append(frame_index)
+                if frame_index in frame_hashes:
+                    continue
                 
-        print("Log: Finished.")
+                frame = frames[frame_index]
+                texture = [n for n in frame['children'] if n['type'] == 1][0]
+                vertex = [n for n in frame['children'] if n['type'] == 2][0]
+                frame_hashes[frame_index] = self.frame_hash(texture, vertex)
+                unique_frames.setdefault(frame_hashes[frame_index], (texture, vertex))
+            index['sequences'][str(sequence['body']['hash_name'])] = frame_indices
+        
+        # Frame sizes are known from the metadata, so atlases are laid out
+        # up front and filled one at a time.
+        sizes = [(texture['body']['width'], texture['body']['height']) for texture, vertex in unique_frames.values()]
+        rects, atlas_sizes = plan_atlases(sizes)
+        rects = dict(zip(unique_frames, rects))
+        
+        for atlas, (atlas_width, atlas_height) in enumerate(atlas_sizes):
+            atlas_image = Image.new('RGBA', (atlas_width, atlas_height))
+            for frame_hash, rect in rects.items():
+                if rect['atlas'] != atlas:
+                    continue
+                texture, vertex = unique_frames[frame_hash]
+                image_data = self.decompress_texture(texture['body']['wflz']['body'])
+                with self.profiler.stage('composite', len(image_data)):
+                    frame_image = self.composite_image(image_data, texture['body']['width'], texture['body']['height'], vertex['body']['pieces'])
+                    atlas_image.paste(frame_image, (rect['x'], rect['y']))
+            
+            atlas_name = ATLAS_NAME.format(atlas)
+            self.save_image(atlas_image, self.directory.joinpath(atlas_name), 'png')
+            index['atlases'].append({"file": atlas_name, "width": atlas_width, "height": atlas_height})
+        
+        index['frames'] = {str(frame_index): rects[frame_hash] for frame_index, frame_hash in sorted(frame_hashes.items())}
+        with open(self.directory.joinpath(ATLAS_INDEX_NAME), 'w') as file:
+            json.dump(index, file)
+        
+        logger.info(f"Decoded {len(unique_frames)} unique frame(s) for {references} reference(s) into {len(atlas_sizes)} atlas(es), saved {references - len(unique_frames)} decode(s).")
             
     
+    def unpack_selection(self, filename, hash_names, frame_indices):
+        # Only node headers are walked, and only the chosen frames' Texture and
+        # Vertex payloads are read from the mapped file and decompressed. No
+        # metadata is written, the folder is an export ANBPack can't rebuild
+        # the .anb from.
+        with ANBFile(filename) as anb:
+            with self.profiler.stage('parse'):
+                references = self.select_frames(anb, hash_names, frame_indices)
+                frames = self.find_frames(anb, {frame_index for hash_name, frame_index in references})
+            
+            decoded_images = {}
+            for hash_name, frame_index in references:
+                directory_path = self.directory.joinpath(str(hash_name))
+                directory_path.mkdir(exist_ok=True)
+                image_name = frame_name(directory_path, frame_index, self.frame_format)
+                remove_other_formats(image_name)
+                if frame_index in decoded_images:
+                    with self.profiler.stage('write'):
+                        shutil.copyfile(decoded_images[frame_index], image_name)
+                    continue
+                
+                texture = frames[frame_index].child(1)
+                vertex = frames[frame_index].child(2)
+                image_data = self.decompress_texture(texture.wflz())
+                self.create_image(image_data, texture.body['width'], texture.body['height'], vertex.pieces(), image_name)
+                decoded_images[frame_index] = image_name
+        
+        logger.info(f"Decoded {len(decoded_images)} selected frame(s) for {len(references)} reference(s).")
+    
+    def select_frames(self, anb, hash_names, frame_indices):
+        # (hash name, frame index) of every sequence frame that was asked for.
+        references = []
+        found_sequences = set()
+        found_frames = set()
+        for sequence in anb.sequences():
+            hash_name = sequence.body['hash_name']
+            if hash_names is not None and hash_name not in hash_names:
+                continue
+            found_sequences.add(hash_name)
+            for sequence_frame in sequence.find(11):
+                frame_index = sequence_frame.body['frame']
+                if frame_indices is None or frame_index in frame_indices:
+                    references.append((hash_name, frame_index))
+                    found_frames.add(frame_index)
+        
+        for hash_name in sorted(set(hash_names or ()) - found_sequences):
+            logger.warning(f"{anb.filename} has no sequence {hash_name}")
+        if frame_indices is not None and len(frame_indices) > len(found_frames):
+            logger.warning(f"{len(frame_indices) - len(found_frames)} selected frame(s) aren't used by the selected sequences")
+        return references
+    
+    def find_frames(self, anb, frame_indices):
+        # Frame nodes by index, each read straight from the Animation node's
+        # list of children.
+        return {frame_index: anb.frame(frame_index) for frame_index in frame_indices}
+    
     def get_nodes(self, node_type, node, nodes):
         if node['type'] == node_type:
             nodes.append(node)
@@ -64,40 +257,76 @@ class ANBUnpack:
             self.get_nodes(node_type, _node, nodes)
         return nodes
     
-    def create_image(self, name, frame_width, frame_height, vertices, frame_index):
-
-        _buffer = Path(name).read_bytes()
+    def frame_hash(self, texture, vertex):
+        frame_hash = hashlib.sha1(texture['body']['wflz']['body'])
+        frame_hash.update(repr((texture['body']['width'], texture['body']['height'], vertex['body']['pieces'])).encode())
+        return frame_hash.digest()
+    
+    def decompress_texture(self, data):
+        with self.profiler.stage('decompress') as stage:
+            image_data = wflz.decompress(data)
+            stage.bytes = len(image_data)
+        return image_data
+    
+    # Pipeline stages of unpack_frames, each takes what the one before returns.
+    def decompress_frame(self, frame):
+        texture, vertex, image_names = frame
+        image_data = self.decompress_texture(texture['body']['wflz']['body'])
+        return image_data, texture['body']['width'], texture['body']['height'], vertex['body']['pieces'], image_names
+    
+    def composite_frame(self, frame):
+        image_data, frame_width, frame_height, vertices, image_names = frame
+        with self.profiler.stage('composite', len(image_data)):
+            return self.composite_image(image_data, frame_width, frame_height, vertices), image_names
+    
+    def encode_frame(self, frame):
+        image, image_names = frame
+        return self.encode_image(image), image_names
+    
+    def write_frame(self, frame):
+        data, image_names = frame
+        for image_name in image_names:
+            self.write_image(data, image_name)
+    
+    def create_image(self, _buffer, frame_width, frame_height, vertices, name):
+        with self.profiler.stage('composite', len(_buffer)):
+            image = self.composite_image(_buffer, frame_width, frame_height, vertices)
+        self.save_image(image, name)
+    
+    def save_image(self, image, name, frame_format=None):
+        self.write_image(self.encode_image(image, frame_format), name)
+    
+    def encode_image(self, image, frame_format=None):
+        with self.profiler.stage('encode') as stage:
+            data = encode_frame(image, frame_format or self.frame_format, self.compress_level)
+            stage.bytes = len(data)
+        return data
+    
+    def write_image(self, data, name):
+        with self.profiler.stage('write', len(data)):
+            with open(name, 'wb') as file:
+                file.write(data)
+            self.digests.record(name, data)
+    
+    def composite_image(self, _buffer, frame_width, frame_height, vertices):
+        # Pieces are copied to the same place they are cut from, anything no
+        # piece covers stays transparent.
+        if np is None:
+            return self.composite_pieces(_buffer, frame_width, frame_height, vertices)
+        
+        texture = np.frombuffer(_buffer, dtype=np.uint8).reshape(frame_height, frame_width, 4)
+        canvas = np.zeros_like(texture)
+        for vertex in vertices:
+            rows = slice(vertex["texY"], vertex["texY"] + vertex["height"])
+            columns = slice(vertex["texX"], vertex["texX"] + vertex["width"])
+            canvas[rows, columns] = texture[rows, columns]
+        return Image.fromarray(canvas)
+    
+    def composite_pieces(self, _buffer, frame_width, frame_height, vertices):
         image_out = Image.frombytes('RGBA', (frame_width, frame_height), _buffer, 'raw')
-
-        min_posX = min(vertex["posX"] for vertex in vertices)
-        min_posY = min(vertex["posY"] for vertex in vertices)
-        max_posX = max(vertex["posX"] + vertex["width"] for vertex in vertices)
-        max_posY = max(vertex["posY"] + vertex["height"] for vertex in vertices)
-
-        canvas_width = int(max_posX - min_posX)
-        canvas_height = int(max_posY - min_posY)
-
+        
         final_image = Image.new("RGBA", (frame_width, frame_height))
         for vertex in vertices:
-            
-            texX = vertex["texX"]
-            texY = vertex["texY"]
-            piece_width = vertex["width"]
-            piece_height = vertex["height"]
-
-            region = (texX, texY, texX + piece_width, texY + piece_height)
-            piece = image_out.crop(region)
-
-            paste_x = int(vertex["texX"])
-            paste_y = int(vertex["texY"])
-            
-            final_image.paste(piece, (paste_x, paste_y), piece)
-
-        final_image.save(Path(name).with_suffix('.png'))
-        
-        os.remove(name)
-
-        
-    def extract_wflz(self, filename):
-        filename = f'"{str(filename)}"'
-        os.system("include\\wflz_extractor\\extractor.exe " + filename)
\ No newline at end of file
+            region = (vertex["texX"], vertex["texY"], vertex["texX"] + vertex["width"], vertex["texY"] + vertex["height"])
+            final_image.paste(image_out.crop(region), region[:2])
+        return final_image
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import mmap
+import os
+import struct
+from pathlib import Path
+
+from anbjson import NodeTypeName, HEADER_SIZE
+from node_structs import *
+
+
+class ANBNode:
+    # Only the node header is decoded up front, bodies and payloads are read
+    # from the mapped file when they are asked for.
+    __slots__ = ('anb', 'offset', 'type', 'num_children', 'child_pointer')
+
+    def __init__(self, anb, offset):
+        self.anb = anb
+        self.offset = offset
+        self.type, self.num_children, self.child_pointer = NodeHeaderStruct.unpack_from(anb.view, offset)
+
+    @property
+    def name(self):
+        return NodeTypeName[self.type]
+
+    @property
+    def child_offsets(self):
+        if not self.num_children:
+            return ()
+        return struct.unpack_from(f'<{self.num_children}Q', self.anb.view, self.child_pointer)
+
+    @property
+    def children(self):
+        return [ANBNode(self.anb, offset) for offset in self.child_offsets]
+
+    @property
+    def body(self):
+        if self.type not in NodeBodyStructs:
+            return {}
+        body_struct, fields = NodeBodyStructs[self.type]
+        return dict(zip(fields, body_struct.unpack_from(self.anb.view, self.offset + NodeHeaderStruct.size)))
+
+    def child_at(self, index):
+        return ANBNode(self.anb, struct.unpack_from('<Q', self.anb.view, self.child_pointer + 8 * index)[0])
+
+    def child(self, node_type):
+        for child in self.children:
+            if child.type == node_type:
+                return child
+        return None
+
+    def find(self, node_type, nested=True):
+        # Depth-first. nested=False doesn't look below a match, for types that
+        # never hold their own kind (Frames, Sequences) it skips their subtrees.
+        stack = [self.offset]
+        while stack:
+            node = ANBNode(self.anb, stack.pop())
+            if node.type == node_type:
+                yield node
+                if not nested:
+                    continue
+            stack.extend(reversed(node.child_offsets))
+
+    def wflz(self):
+        data_offset = self.body['data_offset']
+        flag, size = BlobHeaderStruct.unpack_from(self.anb.view, data_offset)
+        start = data_offset + BlobHeaderStruct.size
+        return self.anb.view[start:start + size]
+
+    def pieces(self):
+        body = self.body
+        start = body['data_offset'] + BlobHeaderStruct.size
+        end = start + VertexPieceStruct.size * body['num_verts']
+        return [dict(zip(VertexPieceFields, piece)) for piece in VertexPieceStruct.iter_unpack(self.anb.view[start:end])]
+
+    def hash(self):
+        hashname_pointer = self.body['hashname_pointer']
+        if hashname_pointer == 0:
+            return None
+        flag, size = BlobHeaderStruct.unpack_from(self.anb.view, hashname_pointer)
+        start = hashname_pointer + BlobHeaderStruct.size
+        return self.anb.view[start:start + max(8, size)]
+
+    def string(self):
+        string_offset = self.body['string_offset']
+        flag, size = BlobHeaderStruct.unpack_from(self.anb.view, string_offset)
+        start = string_offset + BlobHeaderStruct.size
+        return bytes(self.anb.view[start:start + size]).decode('utf-8')
+
+    def __repr__(self):
+        return f"ANBNode({self.name}, offset={self.offset}, children={self.num_children})"
+
+
+class ANBFile:
+    # Reads a file by name, or any buffer holding a whole .anb (an entry of a
+    # mapped .pak for instance) without copying it.
+    def __init__(self, source):
+        if isinstance(source, (str, os.PathLike)):
+            self.filename = Path(source)
+            with open(self.filename, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+        else:
+            self.filename = '<buffer>'
+            self.map = None
+            self.view = memoryview(source)
+
+        header = HeaderStruct.from_buffer_copy(self.view)
+        if header.sig != b'YCSN':
+            self.close()
+            raise ValueError(f"{self.filename} is not an .anb file")
+        self.file_header = {"sig": 'YCSN', "fixup": header.fixup, "version": header.version, "pad1": header.pad1, "pad2": header.pad2}
+        self.root = ANBNode(self, HEADER_SIZE)
+
+    @property
+    def animation(self):
+        return self.root.children[0]
+
+    def animation_run(self, animation, node_type):
+        # The Animation node lists its Meta node, sequence_count Sequences and
+        # then frame_count Frames, so where the Sequences (12) or Frames (10)
+        # start and end among its children follows from the counts.
+        body = animation.body
+        end = animation.num_children
+        if node_type == 12:
+            end -= body['frame_count']
+        return end - body['sequence_count' if node_type == 12 else 'frame_count'], end
+
+    def run_nodes(self, node_type):
+        # Anything laid out differently falls back to walking the tree.
+        animation = self.animation
+        start, end = self.animation_run(animation, node_type)
+        if start >= 0:
+            nodes = [ANBNode(self, offset) for offset in animation.child_offsets[start:end]]
+            if all(node.type == node_type for node in nodes):
+                return nodes
+        return list(self.root.find(node_type, nested=False))
+
+    def sequences(self):
+        return self.run_nodes(12)
+
+    def frames(self):
+        return self.run_nodes(10)
+
+    def frame(self, index):
+        animation = self.animation
+        start, end = self.animation_run(animation, 10)
+        if start >= 0 and 0 <= index < end - start:
+            frame = animation.child_at(start + index)
+            if frame.type == 10:
+                return frame
+        for frame_index, frame in enumerate(self.root.find(10, nested=False)):
+            if frame_index == index:
+                return frame
+        raise IndexError(f"{self.filename} has no frame {index}")
+
+    def close(self):
+        self.view.release()
+        if self.map is None:
+            return
+        try:
+            self.map.close()
+        except BufferError:
+            # Payload views are still alive, the mapping goes away with them.
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,9 +1,7 @@
-import sys
-sys.path.insert(0, 'include')
-
+import mmap
+import os
 import struct
 from node_structs import *
-import base64
 
 NodeTypeName = {
 	0 : 'Node',
@@ -22,113 +20,83 @@ NodeTypeName = {
 	13 :'Animation'
 }
 
+HEADER_SIZE = 24
+
 class ANBToJSON:
-    def __init__(self, filename):
+    # Parses a file by name, or any buffer holding a whole .anb (an entry of a
+    # mapped .pak for instance) without copying it.
+    def __init__(self, source):
         self.metadata = {}
         
-        with open(filename, 'rb') as file:
-            header = HeaderStruct()
-            file.readinto(header)
-            
-            assert header.sig == b'YCSN'
-            
-            self.metadata["file_header"] = {"sig": 'YCSN', "fixup": header.fixup, "version": header.version, "pad1": header.pad1, "pad2": header.pad2}
-            self.recurr(file, self.get_node(file, None))
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as file:
+                file_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = memoryview(file_map)
+        else:
+            file_map = None
+            self.data = memoryview(source)
+        
+        header = HeaderStruct.from_buffer_copy(self.data)
+        assert header.sig == b'YCSN'
+        
+        self.metadata["file_header"] = {"sig": 'YCSN', "fixup": header.fixup, "version": header.version, "pad1": header.pad1, "pad2": header.pad2}
+        self.metadata["Node"] = self.get_node(HEADER_SIZE)
+        self.recurr(self.metadata["Node"])
+        
+        self.data.release()
+        if file_map is not None:
+            file_map.close()
     
-    def recurr(self, file, node):
-        offsets = []
-        for _ in range(node['num_children']):
-            offsets.append(struct.unpack('<Q', file.read(8))[0])
-        for o in offsets:
-            file.seek(o)
-            self.recurr(file, self.get_node(file, node))
+    def recurr(self, node):
+        if node['num_children'] == 0:
+            return
+        for offset in struct.unpack_from(f'<{node["num_children"]}Q', self.data, node['child_pointer']):
+            child = self.get_node(offset)
+            node['children'].append(child)
+            self.recurr(child)
             
-    def get_node(self, file, parent):
-        node = Node()
-        file.readinto(node)
-   
-        node_name = NodeTypeName[node.type]
-        node_struct = eval(node_name)()
-        
-        file.readinto(node_struct)
-                
-        body = {
-        "type": node.type,
-        "num_children": node.num_children,
-        "child_pointer": node.child_pointer,
-        "body": self.get_node_body(node_name, node_struct, file),
+    def get_node(self, offset):
+        node_type, num_children, child_pointer = NodeHeaderStruct.unpack_from(self.data, offset)
+        return {
+        "type": node_type,
+        "num_children": num_children,
+        "child_pointer": child_pointer,
+        "body": self.get_node_body(node_type, offset + NodeHeaderStruct.size),
         "children": []
         }
-        
-        if parent:
-            #print(node_name, node.num_children, NodeTypeName[parent['type']])
-            """
-            if node_name == "Sequence":
-                print("Sequence", body["body"]["hash_name"], body["body"]["frame_count"])
-            if node_name == "SequenceFrame":
-                print("SequenceFrame", body["body"]["frame"])
-            if node_name == "Texture":
-                print("Texture", body["body"]["width"], body["body"]["height"])"""
-                
-            parent['children'].append(body)
-        else:
-            self.metadata["Node"] = body
-            
-        if node.num_children > 0:
-            file.seek(node.child_pointer)
-        
-        return body
     
-    def encode_blob(self, blob):
-        return base64.b64encode(blob).decode('utf-8')
+    def read_blob(self, offset, size):
+        return bytes(self.data[offset:offset + size])
     
-    def get_node_body(self, node_name, node, file):
-            if node_name == 'Node': return {}
+    def get_node_body(self, node_type, offset):
+            if node_type not in NodeBodyStructs: return {}
             
-            body = dict((field, getattr(node, field)) for field, _ in node._fields_)
+            body_struct, fields = NodeBodyStructs[node_type]
+            body = dict(zip(fields, body_struct.unpack_from(self.data, offset)))
+            node_name = NodeTypeName[node_type]
             
             if node_name == 'Vertex':
-                file.seek(node.data_offset)
+                body["hash_flag"], body["hash_size"] = BlobHeaderStruct.unpack_from(self.data, body["data_offset"])
                 
-                body["hash_flag"] = struct.unpack('<I', file.read(4))[0]
-                body["hash_size"] = struct.unpack('<I', file.read(4))[0]
-                body["pieces"] = []
-                
-                for _ in range(node.num_verts):
-                    posX  = struct.unpack('<f', file.read(4))[0]
-                    posY  = struct.unpack('<f', file.read(4))[0]
-                    texX  = struct.unpack('<H', file.read(2))[0]
-                    texY  = struct.unpack('<H', file.read(2))[0]
-                    width = struct.unpack('<H', file.read(2))[0]
-                    height= struct.unpack('<H', file.read(2))[0]
-                    body["pieces"].append({"posX":posX, "posY":posY, "texX":texX, "texY":texY, "width":width, "height":height})
+                start = body["data_offset"] + BlobHeaderStruct.size
+                pieces = self.data[start:start + VertexPieceStruct.size * body["num_verts"]]
+                body["pieces"] = [dict(zip(VertexPieceFields, piece)) for piece in VertexPieceStruct.iter_unpack(pieces)]
                 
             if node_name == 'MetaString':
-                file.seek(node.string_offset)
-                body['string_flag'] = struct.unpack('<I', file.read(4))[0]
-                body['string_size'] = struct.unpack('<I', file.read(4))[0]
-                body['string'] = file.read(body['string_size']).decode('utf-8')
+                body['string_flag'], body['string_size'] = BlobHeaderStruct.unpack_from(self.data, body["string_offset"])
+                body['string'] = self.read_blob(body["string_offset"] + BlobHeaderStruct.size, body['string_size']).decode('utf-8')
                 
             if node_name == 'MetaTable':
-                if node.hashname_pointer != 0:
-                    file.seek(node.hashname_pointer)
-                    body["hash_flag"] = struct.unpack('<I', file.read(4))[0]
-                    body["hash_size"] = struct.unpack('<I', file.read(4))[0]
-                    body["hash"] = self.encode_blob(file.read(max(8, body["hash_size"])))
+                if body["hashname_pointer"] != 0:
+                    body["hash_flag"], body["hash_size"] = BlobHeaderStruct.unpack_from(self.data, body["hashname_pointer"])
+                    body["hash"] = self.read_blob(body["hashname_pointer"] + BlobHeaderStruct.size, max(8, body["hash_size"]))
                     
             if node_name == 'Animation':
-                file.seek(node.hashname_pointer)
-                
-                body["hash_flag"] = struct.unpack('<I', file.read(4))[0]
-                body["hash_size"] = struct.unpack('<I', file.read(4))[0]
-                body["hash"] = self.encode_blob(file.read(max(8, body["hash_size"])))
+                body["hash_flag"], body["hash_size"] = BlobHeaderStruct.unpack_from(self.data, body["hashname_pointer"])
+                body["hash"] = self.read_blob(body["hashname_pointer"] + BlobHeaderStruct.size, max(8, body["hash_size"]))
                 
             if node_name == 'Texture':
-                file.seek(node.data_offset)
-                
-                wflz_struct = WFLZStruct()
-                file.readinto(wflz_struct)
-                
-                body["wflz"] = {"flag": wflz_struct.flag, "size": wflz_struct.size, "body": self.encode_blob(file.read(wflz_struct.size))}
+                flag, size = BlobHeaderStruct.unpack_from(self.data, body["data_offset"])
+                body["wflz"] = {"flag": flag, "size": size, "body": self.read_blob(body["data_offset"] + BlobHeaderStruct.size, size)}
                 
-            return body
\ No newline at end of file
+            return body
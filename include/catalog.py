@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# SQLite catalog of every entry in a set of .pak files, and optionally of the
+# sequences and textures inside each .anb entry. Archives are re-scanned only
+# when their size or mtime changed, extract() seeks straight to an entry's
+# payload using the recorded offsets.
+
+import os
+import sqlite3
+from pathlib import Path
+
+from anbfile import ANBFile
+from pak_archive import PakArchive, copy_range, ANB_HEADER_SIZE
+from tool_log import logger
+
+CATALOG_NAME = 'catalog.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    anbs_indexed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    archive_id INTEGER NOT NULL REFERENCES archives(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    data_offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    filename_hash INTEGER NOT NULL,
+    flags INTEGER NOT NULL,
+    specials INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+    hash_name INTEGER NOT NULL,
+    frame_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS textures (
+    entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+    frame_index INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_name ON entries(name);
+CREATE INDEX IF NOT EXISTS entries_archive ON entries(archive_id);
+CREATE INDEX IF NOT EXISTS sequences_hash_name ON sequences(hash_name);
+CREATE INDEX IF NOT EXISTS sequences_entry ON sequences(entry_id);
+CREATE INDEX IF NOT EXISTS textures_entry ON textures(entry_id);
+"""
+
+
+class Catalog:
+    def __init__(self, filename=CATALOG_NAME):
+        self.filename = Path(filename)
+        self.db = sqlite3.connect(self.filename)
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.executescript(SCHEMA)
+
+    def index(self, game_dir, anbs=False):
+        game_dir = Path(game_dir).resolve()
+        pak_files = sorted(game_dir.rglob('*.pak'))
+        scanned = skipped = 0
+
+        for pak_file in pak_files:
+            stat = pak_file.stat()
+            row = self.db.execute('SELECT size, mtime_ns, anbs_indexed FROM archives WHERE path = ?', (str(pak_file),)).fetchone()
+            if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns and (row[2] or not anbs):
+                skipped += 1
+                continue
+            with self.db:
+                self.index_archive(pak_file, stat, anbs)
+            scanned += 1
+
+        # Archives under this directory that were deleted or renamed.
+        known = {str(pak_file) for pak_file in pak_files}
+        with self.db:
+            for archive_id, path in self.db.execute('SELECT id, path FROM archives').fetchall():
+                if path not in known and game_dir in Path(path).parents:
+                    self.db.execute('DELETE FROM archives WHERE id = ?', (archive_id,))
+
+        logger.info(f"Indexed {scanned} .pak file(s), {skipped} unchanged.")
+
+    def index_archive(self, pak_file, stat, anbs):
+        logger.debug(f"Indexing {pak_file}")
+        self.db.execute('DELETE FROM archives WHERE path = ?', (str(pak_file),))
+        archive_id = self.db.execute('INSERT INTO archives (path, size, mtime_ns, anbs_indexed) VALUES (?, ?, ?, ?)',
+                                     (str(pak_file), stat.st_size, stat.st_mtime_ns, int(anbs))).lastrowid
+
+        with PakArchive(pak_file) as archive:
+            for entry in archive:
+                entry_id = self.db.execute('INSERT INTO entries (archive_id, name, data_offset, size, filename_hash, flags, specials) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                           (archive_id, entry.name, entry.data_offset, entry.size, entry.filename_hash, entry.flags, entry.specials)).lastrowid
+                if anbs and entry.name.endswith('.anb'):
+                    self.index_anb(entry_id, entry)
+
+    def index_anb(self, entry_id, entry):
+        try:
+            anb = ANBFile(entry.data)
+        except ValueError as error:
+            logger.warning(f"{entry.name}: {error}")
+            return
+        with anb:
+            self.db.executemany('INSERT INTO sequences (entry_id, hash_name, frame_count) VALUES (?, ?, ?)',
+                                [(entry_id, body['hash_name'], body['frame_count']) for body in (sequence.body for sequence in anb.sequences())])
+            self.db.executemany('INSERT INTO textures (entry_id, frame_index, width, height) VALUES (?, ?, ?, ?)',
+                                [(entry_id, frame_index, body['width'], body['height'])
+                                 for frame_index, body in enumerate(frame.child(1).body for frame in anb.frames())])
+
+    def find(self, pattern=None, hash_name=None):
+        # (archive, entry name, size) of entries whose name matches a glob
+        # pattern, or of .anb entries holding the sequence hash_name.
+        if hash_name is not None:
+            query = ('SELECT DISTINCT archives.path, entries.name, entries.size FROM sequences '
+                     'JOIN entries ON entries.id = sequences.entry_id JOIN archives ON archives.id = entries.archive_id '
+                     'WHERE sequences.hash_name = ? ORDER BY archives.path, entries.name')
+            return self.db.execute(query, (hash_name,)).fetchall()
+        query = ('SELECT archives.path, entries.name, entries.size FROM entries JOIN archives ON archives.id = entries.archive_id '
+                 'WHERE entries.name GLOB ? ORDER BY archives.path, entries.name')
+        return self.db.execute(query, (pattern or '*',)).fetchall()
+
+    def extract(self, pattern, output_dir, archive=None):
+        query = ('SELECT archives.path, archives.size, archives.mtime_ns, entries.name, entries.data_offset, entries.size '
+                 'FROM entries JOIN archives ON archives.id = entries.archive_id WHERE entries.name GLOB ?')
+        parameters = [pattern]
+        if archive:
+            query += ' AND archives.path = ?'
+            parameters.append(str(Path(archive).resolve()))
+        rows = self.db.execute(query + ' ORDER BY archives.path, entries.data_offset', parameters).fetchall()
+
+        extracted = []
+        for archive_path, size, mtime_ns, name, data_offset, entry_size in rows:
+            stat = os.stat(archive_path)
+            if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                raise ValueError(f"{archive_path} changed since it was indexed, run index again")
+
+            file_name = Path(output_dir).joinpath(Path(archive_path).stem, name)
+            file_name.parent.mkdir(parents=True, exist_ok=True)
+            logger.debug(f"Extracting {name} from {archive_path}")
+            with open(archive_path, 'rb') as src, open(file_name, 'wb') as out:
+                copy_range(src, data_offset + ANB_HEADER_SIZE, entry_size, out)
+            extracted.append(file_name)
+        return extracted
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Frame image formats for unpacked .anb folders:
+#
+#   png  zlib compressed, compress_level 0 (stored) to 9, Pillow's default is 6
+#   tga  uncompressed 32-bit Targa, opens in most image editors
+#   npy  the raw RGBA pixels behind a NumPy .npy header (shape H x W x 4,
+#        uint8), np.load reads it, so does anything that skips the header
+#
+# Packing looks for frame_N.png, frame_N.tga and frame_N.npy in that order.
+#
+# frame_digests.json records the size, mtime and SHA-1 of every image an
+# unpack wrote, so edited folders are found by content.
+
+import ast
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+from PIL import Image
+
+FRAME_FORMATS = ('png', 'tga', 'npy')
+FRAME_SUFFIXES = tuple('.' + frame_format for frame_format in FRAME_FORMATS)
+
+FRAME_DIGESTS_NAME = 'frame_digests.json'
+DIGEST_BUFFER_SIZE = 1 << 20
+
+NPY_MAGIC = b'\x93NUMPY'
+NPY_ALIGNMENT = 64
+
+
+def frame_name(directory, frame_index, frame_format='png'):
+    return directory.joinpath(f'frame_{frame_index}.{frame_format}')
+
+
+def find_frame(directory, frame_index):
+    for frame_format in FRAME_FORMATS:
+        filename = frame_name(directory, frame_index, frame_format)
+        if filename.exists():
+            return filename
+    raise FileNotFoundError(f"No frame_{frame_index} image in {directory}")
+
+
+def remove_other_formats(filename):
+    # A frame left over from an unpack in another format would be found
+    # before this one on pack.
+    for suffix in FRAME_SUFFIXES:
+        if suffix != filename.suffix and filename.with_suffix(suffix).exists():
+            filename.with_suffix(suffix).unlink()
+
+
+def remove_frames(directory):
+    # Sequence folders left over from a one-image-per-frame unpack, before
+    # the same .anb is unpacked into an atlas.
+    for sequence_dir in [path for path in Path(directory).iterdir() if path.is_dir()]:
+        for path in sequence_dir.glob('frame_*'):
+            if path.suffix in FRAME_SUFFIXES:
+                path.unlink()
+        if not any(sequence_dir.iterdir()):
+            sequence_dir.rmdir()
+
+
+def encode_frame(image, frame_format='png', compress_level=None):
+    if frame_format == 'npy':
+        return npy_header(image.width, image.height) + image.tobytes()
+    output = io.BytesIO()
+    if frame_format == 'png' and compress_level is not None:
+        image.save(output, 'PNG', compress_level=compress_level)
+    else:
+        image.save(output, frame_format.upper())
+    return output.getbuffer()
+
+
+def read_frame(filename):
+    # (RGBA pixels, width, height) of a frame in any of the formats.
+    if filename.suffix == '.npy':
+        return read_npy(map_file(filename), filename)
+    with Image.open(filename) as image:
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        return image.tobytes(), image.width, image.height
+
+
+def map_file(filename):
+    # .npy pixels go to the packer straight from the page cache.
+    if filename.stat().st_size == 0:
+        return memoryview(b'')
+    with open(filename, 'rb') as file:
+        return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def npy_header(width, height):
+    header = repr({'descr': '|u1', 'fortran_order': False, 'shape': (height, width, 4)}).encode('latin1')
+    # Version 1.0: magic, version, header length, header padded with spaces
+    # and ended by a newline so the data starts aligned.
+    padding = -(len(NPY_MAGIC) + 4 + len(header) + 1) % NPY_ALIGNMENT
+    header += b' ' * padding + b'\n'
+    return NPY_MAGIC + bytes((1, 0)) + struct.pack('<H', len(header)) + header
+
+
+def read_npy(data, filename):
+    if data[:len(NPY_MAGIC)] != NPY_MAGIC:
+        raise ValueError(f"{filename} is not an .npy file")
+    major = data[len(NPY_MAGIC)]
+    if major == 1:
+        header_size, = struct.unpack_from('<H', data, len(NPY_MAGIC) + 2)
+        start = len(NPY_MAGIC) + 4
+    else:
+        header_size, = struct.unpack_from('<I', data, len(NPY_MAGIC) + 2)
+        start = len(NPY_MAGIC) + 6
+    header = ast.literal_eval(bytes(data[start:start + header_size]).decode('latin1'))
+    shape = header['shape']
+    if header['descr'] != '|u1' or header['fortran_order'] or len(shape) != 3 or shape[2] != 4:
+        raise ValueError(f"{filename} must hold an H x W x 4 uint8 array")
+
+    height, width = shape[:2]
+    pixels = data[start + header_size:]
+    if len(pixels) != width * height * 4:
+        raise ValueError(f"{filename} holds {len(pixels)} bytes of pixels, expected {width * height * 4}")
+    return pixels, width, height
+
+
+def hash_file(filename):
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(DIGEST_BUFFER_SIZE), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class FrameDigests:
+    # Images of one unpacked .anb folder by their path inside it, kept like
+    # pak_cache.json keeps .pak entries: a matching size and mtime means
+    # unchanged, otherwise the content is hashed and compared.
+    def __init__(self, directory, entries=None):
+        self.directory = Path(directory)
+        self.entries = {} if entries is None else entries
+
+    @classmethod
+    def load(cls, directory):
+        filename = Path(directory).joinpath(FRAME_DIGESTS_NAME)
+        if not filename.exists():
+            return None
+        return cls(directory, json.loads(filename.read_text()))
+
+    def save(self):
+        with open(self.directory.joinpath(FRAME_DIGESTS_NAME), 'w') as file:
+            json.dump(self.entries, file)
+
+    def key(self, filename):
+        return Path(filename).relative_to(self.directory).as_posix()
+
+    def record(self, filename, data):
+        self.entries[self.key(filename)] = {"size": len(data), "mtime_ns": os.stat(filename).st_mtime_ns, "sha1": hashlib.sha1(data).hexdigest()}
+
+    def changed(self, filename):
+        entry = self.entries.get(self.key(filename))
+        if entry is None:
+            return True
+        stat = os.stat(filename)
+        if stat.st_size != entry['size']:
+            return True
+        if stat.st_mtime_ns == entry['mtime_ns']:
+            return False
+        return hash_file(filename) != entry['sha1']
+
+    def edited(self):
+        # Any image changed, added or removed since the unpack.
+        images = {self.key(path) for path in self.directory.rglob('*') if path.suffix.lower() in FRAME_SUFFIXES}
+        if images != set(self.entries):
+            return True
+        return any(self.changed(self.directory.joinpath(name)) for name in images)
@@ -97,4 +97,37 @@ class Animation(LittleEndianStructure):
 		('single_texture',c_uint32),
 		('palette_index',c_uint32),
 		('hashname_pointer',c_uint64)
-	]
\ No newline at end of file
+	]
+
+import struct
+
+StructCodes = {
+	c_uint32 : 'I',
+	c_uint64 : 'Q',
+	c_float : 'f'
+}
+
+def compile_struct(node_struct):
+	fields = tuple(field for field, _ in node_struct._fields_)
+	return struct.Struct('<' + ''.join(StructCodes[field_type] for _, field_type in node_struct._fields_)), fields
+
+# Precompiled body decoders keyed by node type, 'Node' has no body of its own.
+NodeBodyStructs = {node_type: compile_struct(node_struct) for node_type, node_struct in {
+	1 : Texture,
+	2 : Vertex,
+	4 : MetaScalar,
+	5 : MetaPoint,
+	6 : MetaAnchor,
+	7 : MetaRect,
+	8 : MetaString,
+	9 : MetaTable,
+	10 : Frame,
+	11 : SequenceFrame,
+	12 : Sequence,
+	13 : Animation
+}.items()}
+
+NodeHeaderStruct = struct.Struct('<IIQ')
+BlobHeaderStruct = struct.Struct('<II')
+VertexPieceStruct = struct.Struct('<ffHHHH')
+VertexPieceFields = ('posX', 'posY', 'texX', 'texY', 'width', 'height')
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import mmap
+import os
+import struct
+from pathlib import Path
+
+FILENAME_OFFSET_SIZE = 8
+ANB_HEADER_SIZE = 32
+PAK_HEADER_SIZE = 24
+
+PAK_HEADER = struct.Struct('<IIQQ')
+ANB_HEADER = struct.Struct('<QQIIII')
+
+
+class PakEntry:
+    __slots__ = ('archive', 'name', 'data_offset', 'size', 'filename_hash', 'flags', 'specials')
+
+    def __init__(self, archive, name, data_offset, size, filename_hash, flags, specials):
+        self.archive = archive
+        self.name = name
+        self.data_offset = data_offset
+        self.size = size
+        self.filename_hash = filename_hash
+        self.flags = flags
+        self.specials = specials
+
+    @property
+    def payload_offset(self):
+        return self.data_offset + ANB_HEADER_SIZE
+
+    @property
+    def data(self):
+        return self.archive.view[self.payload_offset:self.payload_offset + self.size]
+
+    def info(self):
+        return {"filename_hash": self.filename_hash, "flags": self.flags, "specials": self.specials}
+
+    def __repr__(self):
+        return f"PakEntry({self.name!r}, offset={self.data_offset}, size={self.size})"
+
+
+class PakArchive:
+    def __init__(self, filename):
+        self.filename = Path(filename)
+        self.file = open(self.filename, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        self.entries = {}
+
+        magic, file_count, file_header_table_offs, file_name_table_offs = PAK_HEADER.unpack_from(self.map)
+        if magic != 0:
+            self.close()
+            raise ValueError(f"{self.filename} is not a .pak file")
+
+        self.file_header_table_offs = file_header_table_offs
+        self.file_name_table_offs = file_name_table_offs
+        data_offsets = struct.unpack_from(f'<{file_count}Q', self.map, file_header_table_offs)
+        name_offsets = struct.unpack_from(f'<{file_count}Q', self.map, file_name_table_offs)
+
+        for data_offset, name_offset in zip(data_offsets, name_offsets):
+            name = self.map[name_offset:self.map.find(b'\x00', name_offset)].decode()
+            size, time, filename_hash, flags, specials, pad = ANB_HEADER.unpack_from(self.map, data_offset)
+            assert (time == 0 and pad == 0 )
+            self.entries[name] = PakEntry(self, name, data_offset, size, filename_hash, flags, specials)
+
+    def __getitem__(self, name):
+        return self.entries[name]
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def read(self, entry):
+        # Positional reads never touch the shared file position, so worker
+        # threads can read entries concurrently.
+        if not hasattr(os, 'pread'):
+            return bytes(entry.data)
+        data = os.pread(self.file.fileno(), entry.size, entry.payload_offset)
+        if len(data) != entry.size:
+            raise EOFError(f"{self.filename} ended inside {entry.name}")
+        return data
+
+    def names(self):
+        return list(self.entries)
+
+    def metadata(self):
+        return {name: entry.info() for name, entry in self.entries.items()}
+
+    def close(self):
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            # Entry views are still alive, the mapping goes away with them.
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+COPY_BUFFER_SIZE = 1 << 20
+
+
+def align(v: int, m: int):
+    mask = m - 1
+    return (v + mask) & ~mask
+
+
+def padded_name_size(name):
+    return len(name) + max(1, align(len(name), 8) - len(name))
+
+
+def copy_range(src, offset, size, out):
+    out.flush()
+    out_fd, src_fd = out.fileno(), src.fileno()
+
+    for copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if copy is None:
+            continue
+        try:
+            while size > 0:
+                if copy is os.sendfile:
+                    copied = copy(out_fd, src_fd, offset, size)
+                else:
+                    copied = copy(src_fd, out_fd, size, offset)
+                if copied == 0:
+                    raise EOFError(f"{src.name} ended {size} bytes early")
+                offset += copied
+                size -= copied
+            out.seek(0, os.SEEK_END)
+            return
+        except OSError:
+            # Not supported for this pair of files, try the next method.
+            out.seek(0, os.SEEK_END)
+
+    buffer = memoryview(bytearray(min(COPY_BUFFER_SIZE, max(size, 1))))
+    src.seek(offset)
+    while size > 0:
+        read = src.readinto(buffer[:min(size, len(buffer))])
+        if read == 0:
+            raise EOFError(f"{src.name} ended {size} bytes early")
+        out.write(buffer[:read])
+        size -= read
+
+
+class PakWriter:
+    def __init__(self):
+        self.entries = []
+
+    def add_file(self, name, info, filename):
+        self.add_range(name, info, filename, 0, os.stat(filename).st_size)
+
+    def add_range(self, name, info, filename, offset, size):
+        self.entries.append({"name": name, "info": info, "size": size, "path": Path(filename), "offset": offset, "data": None, "chunk": False})
+
+    def add_bytes(self, name, info, data):
+        self.entries.append({"name": name, "info": info, "size": len(data), "path": None, "offset": 0, "data": data, "chunk": False})
+
+    def add_chunk(self, name, info, filename, data_offset, size):
+        # Copies the entry header, payload and padding as stored in another .pak,
+        # runs of chunks that are contiguous there are copied in one go.
+        self.entries.append({"name": name, "info": info, "size": size, "path": Path(filename), "offset": data_offset, "data": None, "chunk": True})
+
+    def layout(self):
+        file_count = len(self.entries)
+        data_offset = PAK_HEADER_SIZE + FILENAME_OFFSET_SIZE * file_count
+        data_offsets = []
+        for entry in self.entries:
+            data_offsets.append(data_offset)
+            data_offset += ANB_HEADER_SIZE + align(entry['size'], 16)
+
+        file_name_table_offs = data_offset
+        name_offset = file_name_table_offs + FILENAME_OFFSET_SIZE * file_count
+        name_offsets = []
+        for entry in self.entries:
+            name_offsets.append(name_offset)
+            name_offset += padded_name_size(entry['name'].encode('utf-8'))
+        return data_offsets, file_name_table_offs, name_offsets
+
+    def write(self, filename):
+        file_count = len(self.entries)
+        data_offsets, file_name_table_offs, name_offsets = self.layout()
+        sources = {}
+
+        try:
+            with open(filename, 'wb') as file:
+                file.write(PAK_HEADER.pack(0, file_count, PAK_HEADER_SIZE, file_name_table_offs))
+                file.write(struct.pack(f'<{file_count}Q', *data_offsets))
+
+                index = 0
+                while index < file_count:
+                    entry = self.entries[index]
+                    if entry['path'] is not None and entry['path'] not in sources:
+                        sources[entry['path']] = open(entry['path'], 'rb')
+
+                    if entry['chunk']:
+                        chunk_end = entry['offset'] + ANB_HEADER_SIZE + align(entry['size'], 16)
+                        index += 1
+                        while index < file_count and self.is_next_chunk(self.entries[index], entry['path'], chunk_end):
+                            chunk_end += ANB_HEADER_SIZE + align(self.entries[index]['size'], 16)
+                            index += 1
+                        copy_range(sources[entry['path']], entry['offset'], chunk_end - entry['offset'], file)
+                        continue
+
+                    info = entry['info']
+                    file.write(ANB_HEADER.pack(entry['size'], 0, info['filename_hash'], info['flags'], info['specials'], 0))
+                    if entry['data'] is not None:
+                        file.write(entry['data'])
+                    else:
+                        copy_range(sources[entry['path']], entry['offset'], entry['size'], file)
+                    file.write(bytes(align(entry['size'], 16) - entry['size']))
+                    index += 1
+
+                file.write(struct.pack(f'<{file_count}Q', *name_offsets))
+                for entry in self.entries:
+                    name = entry['name'].encode('utf-8')
+                    file.write(name + bytes(padded_name_size(name) - len(name)))
+        finally:
+            for source in sources.values():
+                source.close()
+
+    def is_next_chunk(self, entry, path, offset):
+        return entry['chunk'] and entry['path'] == path and entry['offset'] == offset
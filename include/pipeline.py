@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Bounded producer/consumer pipeline. Items flow through named stages, each
+# run by its own pool of threads and fed by a bounded queue, so a slow stage
+# holds back the ones before it instead of buffering every item in memory.
+# Stages that release the GIL (Pillow's zlib encoder, file writes, NumPy
+# copies) overlap with each other and with one pure Python stage.
+#
+#   pipeline = Pipeline([('decompress', decompress, 2), ('write', write, 4)])
+#   pipeline.run(items)
+#   pipeline.report()
+
+import queue
+import threading
+import time
+
+from tool_log import logger
+
+DEFAULT_QUEUE_SIZE = 16
+
+STOP = object()
+
+
+class PipelineStage:
+    def __init__(self, name, function, workers, queue_size):
+        # A stage without workers never drains its queue and the pipeline
+        # would block forever.
+        assert workers >= 1, f"pipeline stage {name} needs at least one worker"
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.queue = queue.Queue(queue_size)
+        self.items = 0
+        self.seconds = 0.0
+        self.puts = 0
+        self.depth_total = 0
+        self.depth_max = 0
+        self.lock = threading.Lock()
+
+    def put(self, item):
+        # Depth is sampled as each item arrives, a stage whose queue sits
+        # near full is the one to give more workers.
+        depth = self.queue.qsize()
+        with self.lock:
+            self.puts += 1
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+        self.queue.put(item)
+
+    def record(self, seconds):
+        with self.lock:
+            self.items += 1
+            self.seconds += seconds
+
+
+class Pipeline:
+    def __init__(self, stages, queue_size=None):
+        self.stages = [PipelineStage(name, function, workers, queue_size or DEFAULT_QUEUE_SIZE) for name, function, workers in stages]
+        self.error = None
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def run(self, items):
+        # Feeds items from the calling thread, then stops each stage once the
+        # one before it has drained. The first error raised by any stage is
+        # raised here after every thread has finished.
+        start = time.perf_counter()
+        threads = [[threading.Thread(target=self.work, args=(index,), daemon=True) for _ in range(stage.workers)]
+                   for index, stage in enumerate(self.stages)]
+        for stage_threads in threads:
+            for thread in stage_threads:
+                thread.start()
+
+        try:
+            for item in items:
+                if self.error is not None:
+                    break
+                self.stages[0].put(item)
+        finally:
+            for stage, stage_threads in zip(self.stages, threads):
+                for _ in stage_threads:
+                    stage.queue.put(STOP)
+                for thread in stage_threads:
+                    thread.join()
+            self.seconds = time.perf_counter() - start
+
+        if self.error is not None:
+            raise self.error
+
+    def work(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is STOP:
+                return
+            if self.error is not None:
+                # Keep draining so upstream puts never block on a dead stage.
+                continue
+            try:
+                start = time.perf_counter()
+                result = stage.function(item)
+                stage.record(time.perf_counter() - start)
+                if next_stage is not None:
+                    next_stage.put(result)
+            except Exception as error:
+                with self.lock:
+                    if self.error is None:
+                        self.error = error
+
+    def report(self):
+        # busy: summed seconds inside the stage function, use: busy share of
+        # the stage's workers over the whole run, items/s: what the stage
+        # could sustain with its workers if it never waited.
+        logger.info(f"{'stage':<12} {'workers':>8} {'items':>8} {'busy s':>10} {'use %':>7} {'items/s':>10} {'avg queue':>10} {'max queue':>10}")
+        for stage in self.stages:
+            use = 100 * stage.seconds / (stage.workers * self.seconds) if self.seconds else 0.0
+            rate = stage.items * stage.workers / stage.seconds if stage.seconds else 0.0
+            depth = stage.depth_total / stage.puts if stage.puts else 0.0
+            logger.info(f"{stage.name:<12} {stage.workers:>8} {stage.items:>8} {stage.seconds:>10.3f} {use:>7.1f} {rate:>10.1f} {depth:>10.1f} {stage.depth_max:>10}")
+        logger.info(f"Pipeline finished in {self.seconds:.3f}s")
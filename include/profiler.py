@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Stage timings for --profile. Tools wrap each unit of work in
+#
+#   with self.profiler.stage('compress') as stage:
+#       data = ...
+#       stage.bytes = len(data)
+#
+# and the profiler keeps per-stage totals (calls, seconds, bytes, items) plus
+# one event per call, written as JSON or as a Chrome trace-event file that
+# chrome://tracing and Perfetto can open. A disabled profiler hands out a
+# shared no-op stage.
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from tool_log import logger
+
+TRACE_FORMATS = ('json', 'chrome')
+
+
+class ProfileStage:
+    __slots__ = ('profiler', 'name', 'bytes', 'items', 'start')
+
+    def __init__(self, profiler, name, size, items):
+        self.profiler = profiler
+        self.name = name
+        self.bytes = size
+        self.items = items
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self, time.perf_counter())
+
+
+class NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class Profiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.stages = {}
+        self.events = []
+        self.lock = threading.Lock()
+
+    def stage(self, name, size=0, items=1):
+        if not self.enabled:
+            return NULL_STAGE
+        return ProfileStage(self, name, size, items)
+
+    def record(self, stage, end):
+        event = (stage.name, stage.start - self.origin, end - stage.start, threading.get_ident(), stage.bytes, stage.items)
+        with self.lock:
+            totals = self.stages.setdefault(stage.name, {"calls": 0, "seconds": 0.0, "bytes": 0, "items": 0})
+            totals["calls"] += 1
+            totals["seconds"] += event[2]
+            totals["bytes"] += stage.bytes
+            totals["items"] += stage.items
+            self.events.append(event)
+
+    def report(self):
+        if not self.enabled:
+            return
+        logger.info(f"{'stage':<12} {'calls':>8} {'seconds':>10} {'MiB':>10} {'MiB/s':>10} {'items':>8}")
+        for name, totals in self.stages.items():
+            mib = totals["bytes"] / (1 << 20)
+            rate = mib / totals["seconds"] if totals["seconds"] else 0.0
+            logger.info(f"{name:<12} {totals['calls']:>8} {totals['seconds']:>10.3f} {mib:>10.2f} {rate:>10.2f} {totals['items']:>8}")
+
+    def write(self, filename, trace_format='json'):
+        if trace_format == 'chrome':
+            pid = os.getpid()
+            trace = {"displayTimeUnit": "ms", "traceEvents": [
+                {"name": name, "cat": "toolkit", "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": pid, "tid": thread,
+                 "args": {"bytes": size, "items": items}}
+                for name, start, duration, thread, size, items in self.events]}
+        else:
+            trace = {"stages": self.stages, "events": [
+                {"name": name, "start": start, "duration": duration, "thread": thread, "bytes": size, "items": items}
+                for name, start, duration, thread, size, items in self.events]}
+        Path(filename).write_text(json.dumps(trace))
+        logger.info(f"Wrote {trace_format} profile to {filename}")
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', metavar='FILE', help="time every stage and write the trace to FILE")
+    parser.add_argument('--trace-format', choices=TRACE_FORMATS, default='json', help="plain JSON or Chrome trace events")
+
+
+def finish_profile(profiler, args):
+    if args.profile:
+        profiler.report()
+        profiler.write(args.profile, args.trace_format)
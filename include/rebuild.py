@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# One-shot rebuild of a .pak from the original and a tree of edited sprite
+# folders laid out like an unpack (sprites/knight.anb -> sprites/knight/).
+# Only folders whose images changed since the unpack are packed, in memory,
+# everything else is copied straight from the original .pak.
+
+import os
+from pathlib import Path
+
+from anb_metadata import METADATA_NAME
+from anb_pack import ANBPack
+from frame_format import FRAME_SUFFIXES, FrameDigests
+from pak_archive import PakArchive, PakWriter
+from profiler import Profiler
+from tool_log import logger
+
+
+class PakRebuild:
+    def __init__(self, pak_file, edited_dir, output=None, cache=None, profiler=None, rebuild_all=False):
+        self.pak_file = Path(pak_file)
+        self.edited_dir = Path(edited_dir)
+        self.output = Path(output or self.edited_dir.joinpath(self.pak_file.name))
+        self.cache = cache
+        self.profiler = profiler or Profiler(enabled=False)
+        self.rebuild_all = rebuild_all
+
+    def rebuild(self):
+        with self.profiler.stage('parse', self.pak_file.stat().st_size):
+            with PakArchive(self.pak_file) as archive:
+                entries = [(entry.name, entry.info(), entry.data_offset, entry.size) for entry in archive]
+
+        writer = PakWriter()
+        rebuilt = []
+        for name, info, data_offset, size in entries:
+            folder = self.edited_dir.joinpath(name).with_suffix('')
+            if name.endswith('.anb') and self.is_edited(folder):
+                logger.info(f"Rebuilding {name}")
+                writer.add_bytes(name, info, ANBPack(folder, self.cache, self.profiler, write=False).data)
+                rebuilt.append(name)
+            else:
+                writer.add_chunk(name, info, self.pak_file, data_offset, size)
+
+        if self.cache:
+            self.cache.trim()
+
+        temp_name = self.output.with_suffix('.pak.tmp')
+        with self.profiler.stage('write', items=len(writer.entries)) as stage:
+            writer.write(temp_name)
+            stage.bytes = os.stat(temp_name).st_size
+        os.replace(temp_name, self.output)
+
+        logger.info(f"Rebuilt {len(rebuilt)} .anb file(s), copied {len(entries) - len(rebuilt)} entries from {self.pak_file} into {self.output}")
+        return rebuilt
+
+    def is_edited(self, folder):
+        metadata = folder.joinpath(METADATA_NAME)
+        if not metadata.exists():
+            return False
+        if self.rebuild_all:
+            return True
+        digests = FrameDigests.load(folder)
+        if digests is not None:
+            return digests.edited()
+        
+        # Unpacked before frame digests were recorded: metadata.json is
+        # written after every frame, so any image saved later was edited.
+        logger.warning(f"{folder} has no frame digests, finding edits by modification time")
+        unpacked = metadata.stat().st_mtime_ns
+        return any(path.suffix.lower() in FRAME_SUFFIXES and path.stat().st_mtime_ns > unpacked for path in folder.rglob('*'))
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Shared logger for the tools. Summaries are logged at INFO, one line per
+# file or entry at DEBUG, so big archives stay quiet unless --verbose asks.
+
+import logging
+import sys
+
+logger = logging.getLogger('toolkit')
+
+PREFIXES = {
+    logging.DEBUG: 'Log',
+    logging.INFO: 'Log',
+    logging.WARNING: 'Warning',
+    logging.ERROR: 'Error',
+    logging.CRITICAL: 'Error',
+}
+
+
+class ToolFormatter(logging.Formatter):
+    def format(self, record):
+        return f"{PREFIXES.get(record.levelno, record.levelname)}: {record.getMessage()}"
+
+
+def setup_logging(verbose=False, quiet=False):
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(ToolFormatter())
+    logger.handlers[:] = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG if verbose else logging.WARNING if quiet else logging.INFO)
+
+
+def add_logging_arguments(parser):
+    parser.add_argument('-v', '--verbose', action='store_true', help="log every file and entry")
+    parser.add_argument('-q', '--quiet', action='store_true', help="only log warnings and errors")
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Compares two .pak or two .anb files without unpacking them. Both files are
+# mapped, their raw bytes are compared chunk by chunk and the first divergent
+# offset is named after the structure it falls in (header field, entry,
+# node path, blob). A structural pass then lists every entry or node that
+# differs, comparing payloads by chunked hashes.
+
+import bisect
+import hashlib
+import struct
+
+from anbfile import ANBFile
+from anbjson import HEADER_SIZE
+from node_structs import NodeBodyStructs, NodeHeaderStruct, BlobHeaderStruct, VertexPieceStruct
+from pak_archive import PakArchive, PAK_HEADER_SIZE, ANB_HEADER_SIZE, FILENAME_OFFSET_SIZE
+
+VERIFY_CHUNK_SIZE = 1 << 20
+
+PAK_HEADER_FIELDS = (('magic', 4), ('file_count', 4), ('file_header_table_offs', 8), ('file_name_table_offs', 8))
+PAK_ENTRY_FIELDS = (('size', 8), ('time', 8), ('filename_hash', 4), ('flags', 4), ('specials', 4), ('pad', 4))
+ANB_FILE_HEADER_FIELDS = (('sig', 4), ('fixup', 4), ('version', 4), ('pad1', 4), ('pad2', 8))
+NODE_HEADER_FIELDS = (('type', 4), ('num_children', 4), ('child_pointer', 8))
+BLOB_HEADER_FIELDS = (('flag', 4), ('size', 4))
+POINTER_FIELDS = ('data_offset', 'string_offset', 'hashname_pointer')
+
+
+def digests(view, start, size, chunk_size=VERIFY_CHUNK_SIZE):
+    for offset in range(start, start + size, chunk_size):
+        yield hashlib.sha1(view[offset:min(offset + chunk_size, start + size)]).digest()
+
+
+def first_difference(view_a, start_a, view_b, start_b, size, chunk_size=VERIFY_CHUNK_SIZE):
+    # Relative offset of the first differing byte in two equally long ranges,
+    # or None. Chunks are hashed, only a mismatching chunk is searched.
+    for index, (digest_a, digest_b) in enumerate(zip(digests(view_a, start_a, size, chunk_size), digests(view_b, start_b, size, chunk_size))):
+        if digest_a == digest_b:
+            continue
+        low = index * chunk_size
+        chunk_a = bytes(view_a[start_a + low:start_a + min(low + chunk_size, size)])
+        chunk_b = bytes(view_b[start_b + low:start_b + min(low + chunk_size, size)])
+        begin, end = 0, len(chunk_a)
+        while end - begin > 1:
+            middle = (begin + end) // 2
+            if chunk_a[begin:middle] == chunk_b[begin:middle]:
+                begin = middle
+            else:
+                end = middle
+        return low + begin
+    return None
+
+
+def field_at(fields, relative):
+    position = 0
+    for name, size in fields:
+        if relative < position + size:
+            return name
+        position += size
+    return None
+
+
+def struct_fields(node_type):
+    body_struct, fields = NodeBodyStructs[node_type]
+    return tuple(zip(fields, (struct.calcsize('<' + code) for code in body_struct.format.lstrip('<'))))
+
+
+class RegionMap:
+    # Sorted (start, end, label, fields) ranges describing one file, so any
+    # offset can be named.
+    def __init__(self):
+        self.regions = []
+        self.starts = None
+
+    def add(self, start, size, label, fields=None):
+        if size > 0:
+            self.regions.append((start, start + size, label, fields))
+
+    def locate(self, offset):
+        if self.starts is None:
+            self.regions.sort(key=lambda region: region[0])
+            self.starts = [region[0] for region in self.regions]
+        index = bisect.bisect_right(self.starts, offset) - 1
+        if index < 0 or offset >= self.regions[index][1]:
+            return "padding"
+        start, end, label, fields = self.regions[index]
+        if fields:
+            return f"{label}.{field_at(fields, offset - start)}"
+        return f"{label} +{offset - start:#x}"
+
+
+class VerifyReport:
+    def __init__(self, kind, max_differences):
+        self.kind = kind
+        self.max_differences = max_differences
+        self.sizes = None
+        self.first_offset = None
+        self.first_location = None
+        self.differences = []
+        self.difference_count = 0
+
+    @property
+    def identical(self):
+        return self.first_offset is None
+
+    def add(self, difference):
+        self.difference_count += 1
+        if len(self.differences) < self.max_differences:
+            self.differences.append(difference)
+
+
+class Verifier:
+    def __init__(self, filename_a, filename_b, max_differences=50):
+        self.filename_a = filename_a
+        self.filename_b = filename_b
+        self.max_differences = max_differences
+
+    def verify(self):
+        with open(self.filename_a, 'rb') as file_a, open(self.filename_b, 'rb') as file_b:
+            signatures = (file_a.read(4), file_b.read(4))
+        kinds = ['anb' if signature == b'YCSN' else 'pak' for signature in signatures]
+        if kinds[0] != kinds[1]:
+            raise ValueError(f"{self.filename_a} is a .{kinds[0]} and {self.filename_b} is a .{kinds[1]}")
+
+        if kinds[0] == 'anb':
+            with ANBFile(self.filename_a) as anb_a, ANBFile(self.filename_b) as anb_b:
+                return self.compare(VerifyReport('anb', self.max_differences), anb_a.view, anb_b.view,
+                                    lambda: anb_regions(anb_a), lambda report: compare_anb(report, anb_a, anb_b))
+        with PakArchive(self.filename_a) as pak_a, PakArchive(self.filename_b) as pak_b:
+            return self.compare(VerifyReport('pak', self.max_differences), pak_a.view, pak_b.view,
+                                lambda: pak_regions(pak_a), lambda report: compare_pak(report, pak_a, pak_b))
+
+    def compare(self, report, view_a, view_b, regions, structure):
+        report.sizes = (len(view_a), len(view_b))
+        offset = first_difference(view_a, 0, view_b, 0, min(len(view_a), len(view_b)))
+        if offset is None and len(view_a) != len(view_b):
+            offset = min(len(view_a), len(view_b))
+        if offset is None:
+            return report
+
+        report.first_offset = offset
+        try:
+            report.first_location = regions().locate(offset) if offset < len(view_a) else "end of file"
+            structure(report)
+        except (struct.error, ValueError, IndexError) as error:
+            # A truncated or corrupt file can point outside itself.
+            report.add(f"structure could not be read past this point: {error}")
+        return report
+
+
+def pak_regions(pak):
+    regions = RegionMap()
+    count = len(pak.entries)
+    regions.add(0, PAK_HEADER_SIZE, "header", PAK_HEADER_FIELDS)
+    name_offsets = struct.unpack_from(f'<{count}Q', pak.view, pak.file_name_table_offs)
+    for index, (entry, name_offset) in enumerate(zip(pak, name_offsets)):
+        regions.add(pak.file_header_table_offs + index * 8, 8, f"data offset table[{index}] ({entry.name})")
+        regions.add(entry.data_offset, ANB_HEADER_SIZE, f"entry {entry.name} header", PAK_ENTRY_FIELDS)
+        regions.add(entry.payload_offset, entry.size, f"entry {entry.name} payload")
+        regions.add(pak.file_name_table_offs + index * FILENAME_OFFSET_SIZE, FILENAME_OFFSET_SIZE, f"name offset table[{index}] ({entry.name})")
+        regions.add(name_offset, len(entry.name.encode()) + 1, f"name of {entry.name}")
+    return regions
+
+
+def compare_pak(report, pak_a, pak_b):
+    header_a = (len(pak_a), pak_a.file_header_table_offs, pak_a.file_name_table_offs)
+    header_b = (len(pak_b), pak_b.file_header_table_offs, pak_b.file_name_table_offs)
+    for (name, size), value_a, value_b in zip(PAK_HEADER_FIELDS[1:], header_a, header_b):
+        if value_a != value_b:
+            report.add(f"header.{name}: {value_a} != {value_b}")
+
+    names_a, names_b = pak_a.names(), pak_b.names()
+    for name in names_a:
+        if name not in pak_b:
+            report.add(f"entry {name}: only in the first archive")
+    for name in names_b:
+        if name not in pak_a:
+            report.add(f"entry {name}: only in the second archive")
+    common_b = [name for name in names_b if name in pak_a]
+    if [name for name in names_a if name in pak_b] != common_b:
+        report.add("entries are in a different order")
+
+    for name in common_b:
+        entry_a, entry_b = pak_a[name], pak_b[name]
+        for field in ('filename_hash', 'flags', 'specials', 'size'):
+            if getattr(entry_a, field) != getattr(entry_b, field):
+                report.add(f"entry {name} header.{field}: {getattr(entry_a, field)} != {getattr(entry_b, field)}")
+        if entry_a.size == entry_b.size:
+            offset = first_difference(pak_a.view, entry_a.payload_offset, pak_b.view, entry_b.payload_offset, entry_a.size)
+            if offset is not None:
+                report.add(f"entry {name} payload differs at +{offset:#x}")
+
+
+def node_children(node, path):
+    counts = {}
+    for child in node.children:
+        index = counts.get(child.name, 0)
+        counts[child.name] = index + 1
+        yield child, f"{path}/{child.name}[{index}]"
+
+
+def walk_nodes(anb_file):
+    stack = [(anb_file.root, anb_file.root.name)]
+    while stack:
+        node, path = stack.pop()
+        yield node, path
+        stack.extend(reversed(list(node_children(node, path))))
+
+
+def node_blobs(node):
+    # (label, pointer, payload size) of every blob a node points at.
+    if node.type not in NodeBodyStructs:
+        return []
+    body = node.body
+    view = node.anb.view
+    if node.type == 1:
+        return [("wfLZ data", body['data_offset'], BlobHeaderStruct.unpack_from(view, body['data_offset'])[1])]
+    if node.type == 2:
+        return [("vertex pieces", body['data_offset'], VertexPieceStruct.size * body['num_verts'])]
+    if node.type == 8:
+        return [("string", body['string_offset'], BlobHeaderStruct.unpack_from(view, body['string_offset'])[1])]
+    if node.type in (9, 13) and body['hashname_pointer']:
+        return [("hash", body['hashname_pointer'], max(8, BlobHeaderStruct.unpack_from(view, body['hashname_pointer'])[1]))]
+    return []
+
+
+def anb_regions(anb_file):
+    regions = RegionMap()
+    regions.add(0, HEADER_SIZE, "file header", ANB_FILE_HEADER_FIELDS)
+    for node, path in walk_nodes(anb_file):
+        regions.add(node.offset, NodeHeaderStruct.size, f"{path} header", NODE_HEADER_FIELDS)
+        if node.type in NodeBodyStructs:
+            regions.add(node.offset + NodeHeaderStruct.size, NodeBodyStructs[node.type][0].size, f"{path} body", struct_fields(node.type))
+        if node.num_children:
+            regions.add(node.child_pointer, 8 * node.num_children, f"{path} child table")
+        for label, pointer, size in node_blobs(node):
+            regions.add(pointer, BlobHeaderStruct.size, f"{path} {label} header", BLOB_HEADER_FIELDS)
+            regions.add(pointer + BlobHeaderStruct.size, size, f"{path} {label}")
+    return regions
+
+
+def compare_anb(report, anb_a, anb_b):
+    if anb_a.file_header != anb_b.file_header:
+        report.add(f"file header: {anb_a.file_header} != {anb_b.file_header}")
+    stack = [(anb_a.root, anb_b.root, anb_a.root.name)]
+    while stack:
+        node_a, node_b, path = stack.pop()
+        if node_a.type != node_b.type:
+            report.add(f"{path}: {node_a.name} != {node_b.name}")
+            continue
+        if node_a.num_children != node_b.num_children:
+            report.add(f"{path}: {node_a.num_children} != {node_b.num_children} children")
+
+        # Pointers move whenever anything before them changes size, compare
+        # what they point at instead.
+        body_a, body_b = node_a.body, node_b.body
+        for field in body_a:
+            if field not in POINTER_FIELDS and body_a[field] != body_b[field]:
+                report.add(f"{path} body.{field}: {body_a[field]} != {body_b[field]}")
+        for (label, pointer_a, size_a), (_, pointer_b, size_b) in zip(node_blobs(node_a), node_blobs(node_b)):
+            if size_a != size_b:
+                report.add(f"{path} {label}: {size_a} != {size_b} bytes")
+                continue
+            offset = first_difference(anb_a.view, pointer_a + BlobHeaderStruct.size, anb_b.view, pointer_b + BlobHeaderStruct.size, size_a)
+            if offset is not None:
+                report.add(f"{path} {label} differs at +{offset:#x}")
+
+        children_a = list(node_children(node_a, path))
+        children_b = [child for child, child_path in node_children(node_b, path)]
+        stack.extend(reversed([(child_a, child_b, child_path) for (child_a, child_path), child_b in zip(children_a, children_b)]))
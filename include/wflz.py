@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Native wfLZ codec, stream compatible with wflz_extractor/extractor.exe.
+#
+# Stream layout:
+#   header  'WFLZ', compressed size (excluding header), decompressed size,
+#           first block (its literal count is the leading literal run)
+#   block   <HBB dist, length, literal count; a non-zero length copies
+#           length + 4 bytes from dist bytes back, then the literals follow
+#   end     an all zero block
+
+import struct
+
+WFLZ_SIG = b'WFLZ'
+WFLZ_HEADER = struct.Struct('<4sII')
+WFLZ_HEADER_SIZE = 16
+WFLZ_BLOCK = struct.Struct('<HBB')
+WFLZ_BLOCK_SIZE = 4
+WFLZ_MIN_MATCH_LEN = 5
+WFLZ_MAX_MATCH_LEN = 0xFF + 4
+WFLZ_MAX_MATCH_DIST = 0xFFFF
+WFLZ_MAX_SEQUENTIAL_LITERALS = 0xFF
+
+
+def get_decompressed_size(data):
+    sig, _, decompressed_size = WFLZ_HEADER.unpack_from(data)
+    if sig != WFLZ_SIG:
+        raise ValueError(f"Bad wfLZ signature {bytes(sig)!r}")
+    return decompressed_size
+
+
+def get_compressed_size(data):
+    sig, compressed_size, _ = WFLZ_HEADER.unpack_from(data)
+    if sig != WFLZ_SIG:
+        raise ValueError(f"Bad wfLZ signature {bytes(sig)!r}")
+    return compressed_size + WFLZ_HEADER_SIZE
+
+
+def decompress(data):
+    data = memoryview(data).cast('B')
+    decompressed_size = get_decompressed_size(data)
+    unpack_block = WFLZ_BLOCK.unpack_from
+
+    out = bytearray()
+    src = WFLZ_HEADER_SIZE
+    dist, length, num_literals = unpack_block(data, WFLZ_HEADER_SIZE - WFLZ_BLOCK_SIZE)
+
+    while True:
+        if num_literals:
+            out += data[src:src + num_literals]
+            src += num_literals
+        elif not dist and not length:
+            break
+
+        dist, length, num_literals = unpack_block(data, src)
+        src += WFLZ_BLOCK_SIZE
+
+        if length:
+            length += 4
+            start = len(out) - dist
+            if dist == 0 or start < 0:
+                raise ValueError(f"Bad wfLZ match distance {dist} at offset {src - WFLZ_BLOCK_SIZE}")
+            if dist >= length:
+                out += out[start:start + length]
+            else:
+                pattern = out[start:]
+                repeat, rest = divmod(length, dist)
+                out += pattern * repeat + pattern[:rest]
+
+    if len(out) != decompressed_size:
+        raise ValueError(f"wfLZ stream decoded to {len(out)} bytes, expected {decompressed_size}")
+    return out
+
+
+def compress(data):
+    data = bytes(data)
+    data_size = len(data)
+    pack_block = WFLZ_BLOCK.pack
+
+    out = bytearray(WFLZ_HEADER_SIZE)
+    block_offset = WFLZ_HEADER_SIZE - WFLZ_BLOCK_SIZE
+    num_literals = 0
+    last_seen = {}
+
+    src = 0
+    literal_start = 0
+    while src < data_size:
+        key = data[src:src + 4]
+        candidate = last_seen.get(key)
+        last_seen[key] = src
+
+        match_length = 0
+        if candidate is not None and src - candidate <= WFLZ_MAX_MATCH_DIST and len(key) == 4:
+            match_length = _match_length(data, candidate, src, min(WFLZ_MAX_MATCH_LEN, data_size - src))
+
+        if match_length < WFLZ_MIN_MATCH_LEN:
+            src += 1
+            continue
+
+        for start in range(literal_start, src, WFLZ_MAX_SEQUENTIAL_LITERALS):
+            run = data[start:min(src, start + WFLZ_MAX_SEQUENTIAL_LITERALS)]
+            if num_literals + len(run) > WFLZ_MAX_SEQUENTIAL_LITERALS:
+                out[block_offset + 3] = num_literals
+                block_offset = len(out)
+                out += pack_block(0, 0, 0)
+                num_literals = 0
+            out += run
+            num_literals += len(run)
+        out[block_offset + 3] = num_literals
+
+        block_offset = len(out)
+        out += pack_block(src - candidate, match_length - 4, 0)
+        num_literals = 0
+
+        for position in range(src + 1, src + match_length, 4):
+            last_seen[data[position:position + 4]] = position
+        src += match_length
+        literal_start = src
+
+    for start in range(literal_start, data_size, WFLZ_MAX_SEQUENTIAL_LITERALS):
+        run = data[start:start + WFLZ_MAX_SEQUENTIAL_LITERALS]
+        if num_literals + len(run) > WFLZ_MAX_SEQUENTIAL_LITERALS:
+            out[block_offset + 3] = num_literals
+            block_offset = len(out)
+            out += pack_block(0, 0, 0)
+            num_literals = 0
+        out += run
+        num_literals += len(run)
+    out[block_offset + 3] = num_literals
+    out += pack_block(0, 0, 0)
+
+    WFLZ_HEADER.pack_into(out, 0, WFLZ_SIG, len(out) - WFLZ_HEADER_SIZE, data_size)
+    return bytes(out)
+
+
+def _match_length(data, candidate, src, limit):
+    length = 4
+    while length + 16 <= limit and data[candidate + length:candidate + length + 16] == data[src + length:src + length + 16]:
+        length += 16
+    while length < limit and data[candidate + length] == data[src + length]:
+        length += 1
+    return length
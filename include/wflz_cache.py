@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# On-disk cache of wfLZ compressed frames, keyed by a SHA-256 of the frame
+# size and its RGBA pixels. Entries live in <cache dir>/<2 hex>/<64 hex>.wflz
+# and are written to a temporary file first and renamed into place, so
+# packers running at the same time never see half-written entries. A hit
+# touches the entry's mtime, trim() evicts the least recently used entries
+# once the cache grows past max_size.
+
+import hashlib
+import os
+import struct
+import tempfile
+import time
+from pathlib import Path
+
+import wflz
+
+WFLZ_CACHE_DIR_ENV = 'ANB_WFLZ_CACHE'
+WFLZ_CACHE_SUFFIX = '.wflz'
+DEFAULT_MAX_SIZE = 512 << 20
+STALE_TEMP_AGE = 3600
+
+
+def default_cache_dir():
+    if os.environ.get(WFLZ_CACHE_DIR_ENV):
+        return Path(os.environ[WFLZ_CACHE_DIR_ENV])
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        return Path(os.environ['LOCALAPPDATA']).joinpath('anb_tool', 'wflz')
+    return Path(os.environ.get('XDG_CACHE_HOME') or Path.home().joinpath('.cache')).joinpath('anb_tool', 'wflz')
+
+
+class WFLZCache:
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = Path(directory or default_cache_dir())
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, pixels, width, height):
+        key = hashlib.sha256(struct.pack('<II', width, height))
+        key.update(pixels)
+        return key.hexdigest()
+
+    def path(self, key):
+        return self.directory.joinpath(key[:2], key + WFLZ_CACHE_SUFFIX)
+
+    def get(self, key, decompressed_size):
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            # Never cached, or evicted by another packer in the meantime.
+            return None
+        try:
+            if wflz.get_compressed_size(data) != len(data) or wflz.get_decompressed_size(data) != decompressed_size:
+                return None
+        except (ValueError, struct.error):
+            return None
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temp_name, path)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+
+    def compress(self, pixels, width, height):
+        key = self.key(pixels, width, height)
+        data = self.get(key, len(pixels))
+        if data is not None:
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        data = wflz.compress(pixels)
+        self.put(key, data)
+        return data
+
+    def trim(self):
+        if not self.directory.exists():
+            return
+        # Leftovers from packers that were killed mid-write.
+        for path in self.directory.glob('*/*.tmp'):
+            try:
+                if time.time() - path.stat().st_mtime > STALE_TEMP_AGE:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+        entries = []
+        total_size = 0
+        for path in self.directory.glob('*/*' + WFLZ_CACHE_SUFFIX):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total_size += stat.st_size
+
+        for mtime_ns, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                path.unlink()
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def report(self):
+        return f"wfLZ cache: {self.hits} hit(s), {self.misses} miss(es), {self.evictions} eviction(s)"
@@ -2,147 +2,171 @@
 # -*- coding: utf-8 -*-
 
 import sys
-import struct
 from pathlib import Path
 import os
 import json
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
-FILENAME_OFFSET_SIZE = 8
-FILE_NAME_HASHES = {}
-ANB_HEADER_SIZE = 32
-PAK_HEADER_SIZE = 24
+sys.path.insert(0, str(Path(__file__).resolve().parent.joinpath('include')))
+from pak_archive import PakArchive, PakWriter, COPY_BUFFER_SIZE, ANB_HEADER_SIZE
+from profiler import Profiler, add_profile_arguments, finish_profile
+from tool_log import logger, setup_logging, add_logging_arguments
+
+PAK_CACHE_NAME = 'pak_cache.json'
 
 class PAKTool:
-    def __init__(self, filename):
+    def __init__(self, filename, incremental=False, jobs=1, output_dir=None, profiler=None):
+        self.profiler = profiler or Profiler(enabled=False)
         if Path(filename).is_file():
-            self.unpack(filename)
+            self.unpack(filename, jobs, output_dir)
         else:
-            self.pack(filename)
-    
-    def unpack(self, filename):
-        parent_dir = Path(filename.stem)
-        parent_dir.mkdir(exist_ok=True)
-        
-        with open(filename, 'rb') as file:
-            magic, file_count, file_header_table_offs, file_name_table_offs = struct.unpack('<IIQQ', file.read(struct.calcsize('<IIQQ')))
-            assert magic == 0
-        
-            file_names = self.get_file_names(file, file_name_table_offs, file_count)
-            file_data_offsets = self.get_data_offsets(file, file_header_table_offs, file_count)
-            
-            for name, data_offset in zip(file_names, file_data_offsets):
-                print(f"Log: Unpacking {name.decode()}")
-                
-                new_directory = Path(name.decode()).parent
-                new_directory = parent_dir.joinpath(new_directory)
+            self.pack(filename, incremental)
+
+    def unpack(self, filename, jobs=1, output_dir=None):
+        filename = Path(filename)
+        parent_dir = Path(output_dir or filename.parent).joinpath(filename.stem)
+        parent_dir.mkdir(parents=True, exist_ok=True)
+
+        with self.profiler.stage('parse', filename.stat().st_size):
+            archive = PakArchive(filename)
+        with archive:
+            entries = list(archive)
+            for new_directory in sorted({parent_dir.joinpath(Path(entry.name).parent) for entry in entries}):
                 new_directory.mkdir(parents=True, exist_ok=True)
-                
-                with open(new_directory.joinpath(Path(name.decode()).name), 'wb') as ff:
-                    ff.write(self.get_file_data(file, data_offset, name))
-                    
-        with open(parent_dir.joinpath('metadata.json'), 'w') as file:
-            json.dump(FILE_NAME_HASHES, file)
-            
-        print("Log: Finished.")
-            
-    def pack(self, foldername):
-        os.chdir(foldername)
-        
-        assert Path('metadata.json').exists
-        global FILE_NAME_HASHES
-        FILE_NAME_HASHES = json.loads(Path('metadata.json').read_text())
-        
-        file_count = len(FILE_NAME_HASHES)
-        file_names = [name for name in FILE_NAME_HASHES]
-        
-        file_names_chunk = self.build_file_names_chunk(file_names)
-        data_chunks = self.build_data_chunks(file_names)
-        data_chunks_size = sum(len(chunk) for chunk in data_chunks)
-        file_name_table_offs_size = FILENAME_OFFSET_SIZE * file_count
-        file_header_table_offs_size = FILENAME_OFFSET_SIZE * file_count
-        
-        with open(foldername.name + '.pak', 'wb') as file:
-            file_name_table_offs = PAK_HEADER_SIZE + file_header_table_offs_size + data_chunks_size
-            file.write(struct.pack('<IIQQ', 0, file_count, PAK_HEADER_SIZE, file_name_table_offs))
-            
-            file_header_table_offsets = self.build_file_header_table_offsets(file_name_table_offs_size, data_chunks)
-            file.write(file_header_table_offsets)
-            
-            for chunk in data_chunks:
-                file.write(chunk)
-                
-            file_name_table_offsets = self.build_file_name_table_offsets(file, file_name_table_offs_size, file_names)
-            file.write(file_name_table_offsets)
-            
-            file.write(file_names_chunk)
-                
-    
-    def build_file_name_table_offsets(self, file, file_name_table_offs_size, file_names):
-        previous_file_name_size = 0
-        current_file_position = file.tell()
-        file_name_table_offsets = b''
-        for name in file_names:
-            offset = current_file_position + file_name_table_offs_size + previous_file_name_size
-            previous_file_name_size += len(name) + len(bytes(max(1, self.align(len(name), 8) - len(name))))
-            file_name_table_offsets += struct.pack('<Q', offset)
-        return file_name_table_offsets
-              
-    
-    def build_file_header_table_offsets(self, file_name_table_offs_size, data_chunks):
-        previous_data_chunks_size = 0
-        file_name_table_offsets = b''
-        for data_chunk in data_chunks:
-            offset = PAK_HEADER_SIZE + file_name_table_offs_size + previous_data_chunks_size
-            previous_data_chunks_size += len(data_chunk)
-            file_name_table_offsets += struct.pack('<Q', offset)
-        return file_name_table_offsets
-          
-            
-    def build_data_chunks(self, file_names):
-        data_chunks = []
-        for name in file_names:
-            with open(name, 'rb') as file:
-                print(f"Log: Packing {name}")
-                file_data = file.read()
-                anb_header = self.build_anb_header(name, len(file_data))
-                assert len(anb_header) == ANB_HEADER_SIZE
-                data_chunks.append(anb_header + file_data + bytes(self.align(len(file_data), 16) - len(file_data)))
-        return data_chunks
-        
-        
-    def build_anb_header(self, filename, file_data_size):
-        file_info = FILE_NAME_HASHES[filename]
-        return struct.pack('<QQIIII', file_data_size, 0, file_info['filename_hash'], file_info['flags'], file_info['specials'], 0)
-    
-    def build_file_names_chunk(self, file_names):
-        encoded_names = [name.encode('utf-8') + bytes(max(1, self.align(len(name), 8) - len(name))) for name in file_names]
-        name_chunk = b''.join(encoded_names)
-        return name_chunk 
-            
-    def get_file_names(self, file, file_name_table_offs, file_count):
-        file.seek(file_name_table_offs + (FILENAME_OFFSET_SIZE * file_count))
-        file_name_chunk = file.read()
-        return [name for name in file_name_chunk.split(b'\x00') if name]
-    
-    def get_data_offsets(self, file, file_header_table_offs, file_count):
-        file.seek(file_header_table_offs)
-        return [struct.unpack('<Q', file.read(8))[0] for _ in range(file_count)]
-    
-    def get_file_data(self, file, data_offset, name):
-        file.seek(data_offset)
-        size, time, filename_hash, flags, specials, pad = struct.unpack('<QQIIII', file.read(struct.calcsize('<QQIIII')))
-        assert (time == 0 and pad == 0 )
-        FILE_NAME_HASHES[name.decode()] = {"filename_hash": filename_hash, "flags": flags, "specials": specials}
-        return file.read(size)
-    
-    def align(self, v: int, m: int):
-        mask = m - 1
-        return (v + mask) & ~mask
-    
-    
+
+            if jobs > 1:
+                with ThreadPoolExecutor(jobs) as pool:
+                    cache_entries = dict(pool.map(lambda entry: self.unpack_entry(parent_dir, entry, archive.read(entry)), entries))
+            else:
+                cache_entries = dict(self.unpack_entry(parent_dir, entry, entry.data) for entry in entries)
+
+            with open(parent_dir.joinpath('metadata.json'), 'w') as file:
+                json.dump(archive.metadata(), file)
+
+        self.write_pak_cache(parent_dir, filename, cache_entries)
+
+        logger.info("Finished.")
+
+    def unpack_entry(self, parent_dir, entry, data):
+        logger.debug(f"Unpacking {entry.name}")
+
+        file_name = parent_dir.joinpath(entry.name)
+        with self.profiler.stage('write', entry.size):
+            with open(file_name, 'wb') as ff:
+                ff.write(data)
+        return entry.name, self.build_cache_entry(entry.info(), entry.data_offset, entry.size, file_name)
+
+    def pack(self, foldername, incremental=False):
+        foldername = Path(foldername)
+        metadata_dir = foldername.joinpath('metadata.json')
+        assert metadata_dir.exists()
+        file_name_hashes = json.loads(metadata_dir.read_text())
+
+        pak_cache = self.load_pak_cache(foldername) if incremental else None
+        reused_entries = {}
+
+        writer = PakWriter()
+        for name, file_info in file_name_hashes.items():
+            cached_entry = self.get_unchanged_entry(pak_cache, name, file_info, foldername.joinpath(name))
+            if cached_entry:
+                reused_entries[name] = cached_entry
+                writer.add_chunk(name, file_info, pak_cache['source'], cached_entry['data_offset'], cached_entry['size'])
+            else:
+                logger.debug(f"Packing {name}")
+                writer.add_file(name, file_info, foldername.joinpath(name))
+
+        pak_name = foldername.joinpath(foldername.resolve().name + '.pak')
+        with self.profiler.stage('write', items=len(writer.entries)) as stage:
+            writer.write(pak_name.with_suffix('.pak.tmp'))
+            stage.bytes = os.stat(pak_name.with_suffix('.pak.tmp')).st_size
+        os.replace(pak_name.with_suffix('.pak.tmp'), pak_name)
+
+        if incremental:
+            if pak_cache:
+                logger.info(f"Reused {len(reused_entries)} of {len(file_name_hashes)} entries from {pak_cache['source']}")
+            data_offsets = writer.layout()[0]
+            cache_entries = {}
+            for entry, data_offset in zip(writer.entries, data_offsets):
+                name = entry['name']
+                sha1 = reused_entries[name]['sha1'] if name in reused_entries else None
+                cache_entries[name] = self.build_cache_entry(entry['info'], data_offset, entry['size'], foldername.joinpath(name), sha1)
+            self.write_pak_cache(foldername, pak_name, cache_entries)
+
+        logger.info("Finished.")
+
+    def get_unchanged_entry(self, pak_cache, name, file_info, file_name):
+        if pak_cache is None or name not in pak_cache['entries']:
+            return None
+        cached_entry = pak_cache['entries'][name]
+        if cached_entry['info'] != file_info:
+            return None
+
+        stat = os.stat(file_name)
+        if stat.st_size != cached_entry['size']:
+            return None
+        if stat.st_mtime_ns != cached_entry['mtime_ns']:
+            # Only entries whose file was touched get hashed, the original
+            # payload is read back from the cached source .pak the first time.
+            if cached_entry['sha1'] is None:
+                cached_entry['sha1'] = self.hash_file(pak_cache['source'], cached_entry['data_offset'] + ANB_HEADER_SIZE, cached_entry['size'])
+            if self.hash_file(file_name) != cached_entry['sha1']:
+                return None
+        return cached_entry
+
+    def load_pak_cache(self, foldername):
+        cache_dir = foldername.joinpath(PAK_CACHE_NAME)
+        if not cache_dir.exists():
+            logger.info(f"No {PAK_CACHE_NAME} found, packing every entry.")
+            return None
+
+        pak_cache = json.loads(cache_dir.read_text())
+        source = Path(pak_cache['source'])
+        if not source.exists() or os.stat(source).st_size != pak_cache['source_size'] or os.stat(source).st_mtime_ns != pak_cache['source_mtime_ns']:
+            logger.info(f"{source} changed since it was cached, packing every entry.")
+            return None
+        return pak_cache
+
+    def write_pak_cache(self, foldername, source, cache_entries):
+        source = Path(source).resolve()
+        pak_cache = {
+        "source": str(source),
+        "source_size": os.stat(source).st_size,
+        "source_mtime_ns": os.stat(source).st_mtime_ns,
+        "entries": cache_entries
+        }
+        with open(foldername.joinpath(PAK_CACHE_NAME), 'w') as file:
+            json.dump(pak_cache, file)
+
+    def build_cache_entry(self, file_info, data_offset, size, file_name, sha1=None):
+        return {"info": file_info, "data_offset": data_offset, "size": size, "mtime_ns": os.stat(file_name).st_mtime_ns, "sha1": sha1}
+
+    def hash_file(self, file_name, offset=0, size=None):
+        sha1 = hashlib.sha1()
+        with open(file_name, 'rb') as file:
+            file.seek(offset)
+            if size is None:
+                size = os.fstat(file.fileno()).st_size - offset
+            while size > 0:
+                chunk = file.read(min(COPY_BUFFER_SIZE, size))
+                if not chunk:
+                    break
+                sha1.update(chunk)
+                size -= len(chunk)
+        return sha1.hexdigest()
+
+
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print("Error: Please specify a target .pak file or directory to pack.")
-        exit()
-    os.chdir(Path(sys.argv[1]).parent)
-    PAKTool(Path(sys.argv[1]))
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Unpack a .pak file, or pack an unpacked .pak folder.")
+    parser.add_argument('target', help="a .pak file to unpack or a directory to pack")
+    parser.add_argument('--incremental', action='store_true', help="only repack entries that changed since the last unpack or incremental pack")
+    parser.add_argument('--jobs', type=int, default=1, metavar='N', help="number of threads writing unpacked files")
+    add_profile_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args.verbose, args.quiet)
+
+    profiler = Profiler(enabled=bool(args.profile))
+    PAKTool(Path(args.target), args.incremental, args.jobs, profiler=profiler)
+    finish_profile(profiler, args)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.joinpath('include')))
+from rebuild import PakRebuild
+from wflz_cache import WFLZCache, DEFAULT_MAX_SIZE
+from profiler import Profiler, add_profile_arguments, finish_profile
+from tool_log import logger, setup_logging, add_logging_arguments
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rebuild a .pak from the original and a folder of edited sprites in one go.")
+    parser.add_argument('pak_file', help="the original .pak")
+    parser.add_argument('edited_dir', help="folder laid out like the unpacked .pak, holding the edited sprite folders")
+    parser.add_argument('--output', help="the new .pak, defaults to EDITED_DIR/<pak name>")
+    parser.add_argument('--all', action='store_true', dest='rebuild_all', help="repack every sprite folder found, edited or not")
+    parser.add_argument('--cache-dir', help="where compressed frames are cached between packs (default: your user cache folder)")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_SIZE >> 20, metavar='MB', help="maximum size of the frame cache")
+    parser.add_argument('--no-cache', action='store_true', help="always compress every frame")
+    add_profile_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args.verbose, args.quiet)
+
+    profiler = Profiler(enabled=bool(args.profile))
+    cache = None if args.no_cache else WFLZCache(args.cache_dir, args.cache_size << 20)
+    try:
+        PakRebuild(args.pak_file, args.edited_dir, args.output, cache, profiler, args.rebuild_all).rebuild()
+    except ValueError as error:
+        logger.error(str(error))
+        sys.exit(1)
+    finish_profile(profiler, args)
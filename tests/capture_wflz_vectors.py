@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Regenerates tests/data/wflz from the reference codec in extractor.exe. For
+# every input it writes
+#
+#   NAME.raw        the uncompressed bytes
+#   NAME.ref.wflz   extractor.exe's wfLZ_Compress output
+#   NAME.ours.wflz  include/wflz.py's compress output
+#
+# after checking that extractor.exe's wfLZ_Decompress reads NAME.ours.wflz
+# back to NAME.raw and include/wflz.py reads NAME.ref.wflz back to NAME.raw.
+# Needs gcc on x86-64 Linux (see wflz_reference.c), no Wine.
+#
+#   python tests/capture_wflz_vectors.py
+
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT.joinpath('include')))
+
+import wflz
+
+EXTRACTOR = ROOT.joinpath('include', 'wflz_extractor', 'extractor.exe')
+DATA_DIR = ROOT.joinpath('tests', 'data', 'wflz')
+
+
+def sprite_frame(width=32, height=32):
+    # A small RGBA frame: transparent border, a flat body, a gradient stripe
+    # and some noise, like the textures in real .anb files.
+    rng = random.Random(7)
+    pixels = bytearray()
+    for y in range(height):
+        for x in range(width):
+            if x < 4 or y < 4 or x >= width - 4 or y >= height - 4:
+                pixels += bytes(4)
+            elif y == height // 2:
+                pixels += bytes((x * 8, 255 - x * 8, 128, 255))
+            elif (x + y) % 7 == 0:
+                pixels += bytes((rng.randrange(256), rng.randrange(256), rng.randrange(256), 255))
+            else:
+                pixels += bytes((200, 40, 40, 255))
+    return bytes(pixels)
+
+
+def vectors():
+    rng = random.Random(1)
+    return {
+        'hello': b'hello hello hello hello world',
+        'empty': b'',
+        'literals_300': bytes(rng.randrange(256) for _ in range(300)),
+        'zeros_260': bytes(260),
+        'overlap_ab': b'ab' * 500,
+        'frame_32x32': sprite_frame(),
+    }
+
+
+def reference(tool, mode, data, work_dir):
+    source, target = work_dir.joinpath('in.bin'), work_dir.joinpath('out.bin')
+    source.write_bytes(data)
+    subprocess.run([str(tool), str(EXTRACTOR), mode, str(source), str(target)], check=True)
+    return target.read_bytes()
+
+
+if __name__ == '__main__':
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = Path(temp_dir)
+        tool = work_dir.joinpath('wflz_reference')
+        subprocess.run(['gcc', '-O1', '-o', str(tool), str(Path(__file__).resolve().parent.joinpath('wflz_reference.c'))], check=True)
+
+        for name, data in vectors().items():
+            ref_stream = reference(tool, 'compress', data, work_dir)
+            our_stream = wflz.compress(data)
+            if bytes(wflz.decompress(ref_stream)) != data:
+                sys.exit(f"Error: wflz.decompress can't read extractor.exe's stream for {name}")
+            if reference(tool, 'decompress', our_stream, work_dir) != data:
+                sys.exit(f"Error: extractor.exe can't read wflz.compress's stream for {name}")
+
+            DATA_DIR.joinpath(f'{name}.raw').write_bytes(data)
+            DATA_DIR.joinpath(f'{name}.ref.wflz').write_bytes(ref_stream)
+            DATA_DIR.joinpath(f'{name}.ours.wflz').write_bytes(our_stream)
+            print(f"Log: {name}: {len(data)} bytes, reference {len(ref_stream)}, ours {len(our_stream)}")
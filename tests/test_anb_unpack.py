@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Unpacking one .anb into the same folder in both modes, one image per frame
+# and atlas, must leave only the last mode's images behind.
+#
+#   python -m unittest discover tests
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT.joinpath('include')))
+sys.path.insert(0, str(ROOT.joinpath('benchmarks')))
+
+from anb_atlas import ANBAtlas
+from anb_unpack import ANBUnpack
+from frame_format import FrameDigests
+from synthetic import build_anb, write_anb
+from tool_log import logger
+
+
+class ModeSwitchTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.filename = Path(temp_dir.name).joinpath('switch.anb')
+        write_anb(self.filename, build_anb(frame_count=6, sequence_count=2, frames_per_sequence=4, width=16, height=16))
+        self.directory = self.filename.with_suffix('')
+        logger.disabled = True
+        self.addCleanup(setattr, logger, 'disabled', False)
+
+    def unpack(self, atlas):
+        ANBUnpack(str(self.filename), atlas=atlas)
+        images = sorted(path.relative_to(self.directory).as_posix() for path in self.directory.rglob('*.png'))
+        self.assertFalse(FrameDigests.load(self.directory).edited())
+        self.assertEqual(ANBAtlas.exists(self.directory), atlas)
+        return images
+
+    def test_frames_atlas_frames(self):
+        frames = self.unpack(atlas=False)
+        self.assertEqual(len(frames), 8)
+        self.assertEqual(self.unpack(atlas=True), ['atlas_0.png'])
+        self.assertEqual(self.unpack(atlas=False), frames)
+
+    def test_atlas_frames_atlas(self):
+        atlas = self.unpack(atlas=True)
+        self.unpack(atlas=False)
+        self.assertEqual(self.unpack(atlas=True), atlas)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ANBFile's direct lookups must find the same nodes as walking the tree.
+#
+#   python -m unittest discover tests
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT.joinpath('include')))
+sys.path.insert(0, str(ROOT.joinpath('benchmarks')))
+
+from anbfile import ANBFile
+from synthetic import build_anb, write_anb
+
+
+class LookupTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        filename = Path(temp_dir.name).joinpath('lookup.anb')
+        write_anb(filename, build_anb(frame_count=40, sequence_count=5, frames_per_sequence=8, width=8, height=8))
+        self.anb = ANBFile(filename)
+        self.addCleanup(self.anb.close)
+
+    def offsets(self, nodes):
+        return [node.offset for node in nodes]
+
+    def test_frames(self):
+        walked = self.offsets(self.anb.root.find(10))
+        self.assertEqual(len(walked), 40)
+        self.assertEqual(self.offsets(self.anb.frames()), walked)
+        self.assertEqual([self.anb.frame(index).offset for index in range(40)], walked)
+        with self.assertRaises(IndexError):
+            self.anb.frame(40)
+
+    def test_sequences(self):
+        walked = self.offsets(self.anb.root.find(12))
+        self.assertEqual(len(walked), 5)
+        self.assertEqual(self.offsets(self.anb.sequences()), walked)
+        self.assertEqual(self.offsets(self.anb.root.find(12, nested=False)), walked)
+
+
+if __name__ == '__main__':
+    unittest.main()
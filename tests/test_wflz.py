@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Checks include/wflz.py against streams captured from the reference codec in
+# extractor.exe (tests/data/wflz, see capture_wflz_vectors.py), plus round
+# trips over the stream format's edge cases.
+#
+#   python -m unittest discover tests
+
+import random
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT.joinpath('include')))
+
+import wflz
+
+DATA_DIR = ROOT.joinpath('tests', 'data', 'wflz')
+VECTORS = sorted(path.name[:-len('.raw')] for path in DATA_DIR.glob('*.raw'))
+
+
+def blocks(stream):
+    # (dist, length, literal count) of every block after the header's.
+    offset = wflz.WFLZ_HEADER_SIZE + stream[wflz.WFLZ_HEADER_SIZE - 1]
+    while True:
+        dist, length, num_literals = wflz.WFLZ_BLOCK.unpack_from(stream, offset)
+        yield dist, length, num_literals
+        if not dist and not length and not num_literals:
+            return
+        offset += wflz.WFLZ_BLOCK_SIZE + num_literals
+
+
+class ReferenceStreamTest(unittest.TestCase):
+    def test_vectors_present(self):
+        self.assertIn('frame_32x32', VECTORS)
+
+    def test_decompress_reference_streams(self):
+        # Streams written by extractor.exe's wfLZ_Compress.
+        for name in VECTORS:
+            with self.subTest(name):
+                raw = DATA_DIR.joinpath(f'{name}.raw').read_bytes()
+                self.assertEqual(bytes(wflz.decompress(DATA_DIR.joinpath(f'{name}.ref.wflz').read_bytes())), raw)
+
+    def test_compress_matches_verified_streams(self):
+        # These exact streams were decoded by extractor.exe's wfLZ_Decompress
+        # when captured, any change to the encoder output needs a re-capture.
+        for name in VECTORS:
+            with self.subTest(name):
+                raw = DATA_DIR.joinpath(f'{name}.raw').read_bytes()
+                self.assertEqual(wflz.compress(raw), DATA_DIR.joinpath(f'{name}.ours.wflz').read_bytes())
+
+    def test_header(self):
+        for name in VECTORS:
+            with self.subTest(name):
+                stream = DATA_DIR.joinpath(f'{name}.ref.wflz').read_bytes()
+                raw_size = DATA_DIR.joinpath(f'{name}.raw').stat().st_size
+                self.assertEqual(wflz.get_compressed_size(stream), len(stream))
+                self.assertEqual(wflz.get_decompressed_size(stream), raw_size)
+
+    def test_rejects_bad_signature(self):
+        stream = bytearray(DATA_DIR.joinpath('hello.ref.wflz').read_bytes())
+        stream[:4] = b'WFLX'
+        with self.assertRaises(ValueError):
+            wflz.decompress(stream)
+
+
+class RoundTripTest(unittest.TestCase):
+    def round_trip(self, data):
+        stream = wflz.compress(data)
+        self.assertEqual(bytes(wflz.decompress(stream)), data)
+        self.assertEqual(wflz.get_compressed_size(stream), len(stream))
+        return stream
+
+    def test_empty(self):
+        stream = self.round_trip(b'')
+        self.assertEqual(list(blocks(stream)), [(0, 0, 0)])
+
+    def test_literal_runs(self):
+        # Runs longer than 255 literals continue in (0, 0, n) blocks.
+        rng = random.Random(3)
+        for size in (1, 254, 255, 256, 510, 511, 1000):
+            with self.subTest(size):
+                data = bytes(rng.randrange(256) for _ in range(size))
+                stream = self.round_trip(data)
+                self.assertTrue(all(num_literals <= wflz.WFLZ_MAX_SEQUENTIAL_LITERALS for _, _, num_literals in blocks(stream)))
+
+    def test_max_match_length(self):
+        for size in (wflz.WFLZ_MAX_MATCH_LEN, wflz.WFLZ_MAX_MATCH_LEN + 1, wflz.WFLZ_MAX_MATCH_LEN * 3 + 7, 5000):
+            with self.subTest(size):
+                stream = self.round_trip(bytes(size))
+                self.assertTrue(all(length + 4 <= wflz.WFLZ_MAX_MATCH_LEN for _, length, _ in blocks(stream)))
+
+    def test_overlapping_matches(self):
+        # Distance shorter than the match, the copy repeats its own output.
+        for pattern in (b'a', b'ab', b'abc', b'abcde'):
+            with self.subTest(pattern):
+                stream = self.round_trip(b'xyz' + pattern * 300)
+                self.assertTrue(any(length and dist < length + 4 for dist, length, _ in blocks(stream)))
+
+    def test_match_distance_limit(self):
+        rng = random.Random(5)
+        chunk = bytes(rng.randrange(256) for _ in range(64))
+        for gap in (wflz.WFLZ_MAX_MATCH_DIST - 64, wflz.WFLZ_MAX_MATCH_DIST - 63, wflz.WFLZ_MAX_MATCH_DIST):
+            with self.subTest(gap):
+                filler = bytes(rng.randrange(256) for _ in range(gap))
+                stream = self.round_trip(chunk + filler + chunk)
+                self.assertTrue(all(dist <= wflz.WFLZ_MAX_MATCH_DIST for dist, _, _ in blocks(stream)))
+
+    def test_frame_like_data(self):
+        rng = random.Random(9)
+        rows = [bytes(rng.choice((0, 255)) for _ in range(256)) for _ in range(8)]
+        self.round_trip(b''.join(rng.choice(rows) for _ in range(64)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+/*
+ * Runs the wfLZ codec inside include/wflz_extractor/extractor.exe natively
+ * on x86-64 Linux, without Wine: the PE sections are mapped at their image
+ * addresses and the (self-contained) wfLZ functions are called through
+ * ms_abi function pointers. Used by capture_wflz_vectors.py.
+ *
+ *   gcc -O1 -o wflz_reference wflz_reference.c
+ *   ./wflz_reference extractor.exe compress|decompress IN OUT
+ */
+#define _GNU_SOURCE
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/mman.h>
+
+/* Symbol addresses from objdump -t extractor.exe. */
+#define WFLZ_GET_MAX_COMPRESSED_SIZE 0x4015c3
+#define WFLZ_GET_WORK_MEM_SIZE       0x4015f4
+#define WFLZ_COMPRESS                0x401a15
+#define WFLZ_GET_DECOMPRESSED_SIZE   0x401eed
+#define WFLZ_DECOMPRESS              0x402000
+
+typedef uint32_t (__attribute__((ms_abi)) *max_size_fn)(uint32_t);
+typedef uint32_t (__attribute__((ms_abi)) *work_mem_fn)(void);
+typedef uint32_t (__attribute__((ms_abi)) *compress_fn)(const uint8_t *, uint32_t, uint8_t *, const uint8_t *, uint32_t);
+typedef uint32_t (__attribute__((ms_abi)) *size_fn)(const uint8_t *);
+typedef void (__attribute__((ms_abi)) *decompress_fn)(const uint8_t *, uint8_t *);
+
+static uint8_t *read_file(const char *name, uint32_t *size)
+{
+    FILE *file = fopen(name, "rb");
+    if (!file) { perror(name); exit(1); }
+    fseek(file, 0, SEEK_END);
+    *size = (uint32_t)ftell(file);
+    fseek(file, 0, SEEK_SET);
+    uint8_t *data = malloc(*size + 1);
+    if (fread(data, 1, *size, file) != *size) { perror(name); exit(1); }
+    fclose(file);
+    return data;
+}
+
+static void map_image(const uint8_t *pe)
+{
+    uint32_t header = *(const uint32_t *)(pe + 0x3c);
+    uint16_t sections = *(const uint16_t *)(pe + header + 6);
+    uint16_t optional_size = *(const uint16_t *)(pe + header + 20);
+    uint64_t image_base = *(const uint64_t *)(pe + header + 24 + 24);
+    const uint8_t *section = pe + header + 24 + optional_size;
+
+    for (uint16_t index = 0; index < sections; index++, section += 40) {
+        uint32_t virtual_size = *(const uint32_t *)(section + 8);
+        uint32_t virtual_address = *(const uint32_t *)(section + 12);
+        uint32_t raw_size = *(const uint32_t *)(section + 16);
+        uint32_t raw_offset = *(const uint32_t *)(section + 20);
+        uint64_t start = image_base + virtual_address;
+        uint64_t size = virtual_size > raw_size ? virtual_size : raw_size;
+        uint64_t page = start & ~0xfffULL;
+        uint64_t end = (start + size + 0xfff) & ~0xfffULL;
+        if (mmap((void *)page, end - page, PROT_READ | PROT_WRITE | PROT_EXEC,
+                 MAP_PRIVATE | MAP_ANONYMOUS | MAP_FIXED_NOREPLACE, -1, 0) != (void *)page) {
+            perror("mmap");
+            exit(1);
+        }
+        memcpy((void *)start, pe + raw_offset, raw_size < size ? raw_size : size);
+    }
+}
+
+int main(int argc, char **argv)
+{
+    if (argc != 5) {
+        fprintf(stderr, "usage: %s extractor.exe compress|decompress IN OUT\n", argv[0]);
+        return 2;
+    }
+    uint32_t pe_size, in_size;
+    map_image(read_file(argv[1], &pe_size));
+    uint8_t *in = read_file(argv[3], &in_size);
+    uint8_t *out;
+    uint32_t out_size;
+
+    if (strcmp(argv[2], "compress") == 0) {
+        uint8_t *work_mem = malloc(((work_mem_fn)WFLZ_GET_WORK_MEM_SIZE)());
+        out = calloc(1, ((max_size_fn)WFLZ_GET_MAX_COMPRESSED_SIZE)(in_size));
+        out_size = ((compress_fn)WFLZ_COMPRESS)(in, in_size, out, work_mem, 0);
+    } else {
+        out_size = ((size_fn)WFLZ_GET_DECOMPRESSED_SIZE)(in);
+        out = calloc(1, out_size + 16);
+        ((decompress_fn)WFLZ_DECOMPRESS)(in, out);
+    }
+
+    FILE *file = fopen(argv[4], "wb");
+    fwrite(out, 1, out_size, file);
+    fclose(file);
+    return 0;
+}
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.joinpath('include')))
+from verify import Verifier
+from tool_log import logger, setup_logging, add_logging_arguments
+
+
+class VerifyTool:
+    def __init__(self, filename_a, filename_b, max_differences=50):
+        report = Verifier(filename_a, filename_b, max_differences).verify()
+        self.identical = report.identical
+
+        if report.identical:
+            logger.info(f"{filename_a} and {filename_b} are identical ({report.sizes[0]} bytes).")
+            return
+
+        logger.warning(f"{filename_a} and {filename_b} differ ({report.sizes[0]} and {report.sizes[1]} bytes).")
+        logger.warning(f"First divergent offset {report.first_offset:#x} ({report.first_offset}): {report.first_location}")
+        if report.difference_count:
+            logger.info(f"{report.difference_count} structural difference(s):")
+            for difference in report.differences:
+                logger.info(f"  {difference}")
+            if report.difference_count > len(report.differences):
+                logger.info(f"  ... {report.difference_count - len(report.differences)} more")
+        else:
+            logger.info("No structural differences, only the layout differs.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare two .pak or two .anb files structure by structure.")
+    parser.add_argument('original', help="the original .pak or .anb")
+    parser.add_argument('repacked', help="the repacked file to check against it")
+    parser.add_argument('--max-differences', type=int, default=50, metavar='N', help="structural differences to list")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(args.verbose, args.quiet)
+
+    try:
+        sys.exit(0 if VerifyTool(args.original, args.repacked, args.max_differences).identical else 1)
+    except ValueError as error:
+        logger.error(str(error))
+        sys.exit(2)